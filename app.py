@@ -2,10 +2,19 @@
 import streamlit as st
 import json
 import traceback
-from nexus_pipeline import run_pipeline
+from nexus_pipeline import run_pipeline, resume
+from pipeline_context import get_default_context
 
 st.set_page_config(page_title="Project Nexus - Agentic System Builder", layout="wide")
 
+
+@st.cache_resource
+def pipeline_context(rag_dir: str):
+    """One warmed-up context per server process, reused by every session and rerun."""
+    context = get_default_context()
+    context.warm_up(rag_persist_dir=rag_dir)
+    return context
+
 st.title("🧩 Project Nexus: Agentic System Orchestrator")
 st.write("This interface connects your RAG, prompt engine, validator, reader, and writer agents.")
 
@@ -16,15 +25,58 @@ user_query = st.text_input("Enter your system request:", placeholder="Example: C
 with st.expander("Advanced Settings"):
     rag_dir = st.text_input("RAG Memory Directory", "./rag_memory")
     output_dir = st.text_input("Code Output Directory", "./generated_code")
+    resume_id = st.text_input("Resume Run ID (optional)", "", help="Continue a checkpointed run from its first incomplete stage.")
 
 # Run button
 if st.button("Run Nexus Pipeline"):
-    if not user_query.strip():
+    if not user_query.strip() and not resume_id.strip():
         st.warning("Please enter a valid query.")
     else:
-        with st.spinner("Running Nexus pipeline..."):
+        with st.status("Running Nexus pipeline...", expanded=True) as status:
+            progress = st.empty()
+            preview = st.empty()
+            state = {"done": 0, "total": 0, "component": None, "tail": ""}
+
+            def show_progress(event):
+                # Called from the writer's generator on this script's thread.
+                kind = event["event"]
+                if kind == "start":
+                    state["total"] = len(event["components"])
+                    progress.write(f"Generating {state['total']} components...")
+                elif kind == "component_start":
+                    state["component"], state["tail"] = event["component"], ""
+                elif kind == "chunk" and event["component"] == state["component"]:
+                    # Only the tail is kept, so the preview stays small for large files.
+                    state["tail"] = (state["tail"] + event["text"])[-2000:]
+                    preview.code(state["tail"], language="python")
+                elif kind == "component_done":
+                    state["done"] += 1
+                    note = "unchanged" if event["reused"] else f"{event['size']} characters"
+                    progress.write(f"{state['done']}/{state['total']} written: {event['file']} ({note})")
+
+            result, error = None, None
+            try:
+                if resume_id.strip():
+                    result = resume(resume_id.strip(), on_event=show_progress, context=pipeline_context(rag_dir))
+                else:
+                    result = run_pipeline(
+                        user_query,
+                        rag_persist_dir=rag_dir,
+                        code_output_dir=output_dir,
+                        on_event=show_progress,
+                        context=pipeline_context(rag_dir)
+                    )
+                preview.empty()
+                status.update(label="Nexus pipeline finished.", state="complete", expanded=False)
+            except Exception:
+                error = traceback.format_exc()
+                status.update(label="Nexus pipeline failed.", state="error")
+
+        if error is not None:
+            st.error("An error occurred during pipeline execution.")
+            st.text(error)
+        else:
             try:
-                result = run_pipeline(user_query, rag_persist_dir=rag_dir, code_output_dir=output_dir)
                 st.success("Pipeline completed successfully!")
 
                 # Display the summary cleanly
@@ -44,7 +96,7 @@ if st.button("Run Nexus Pipeline"):
                         size = file_info["size"]
                         st.write(f"**{name}**  — {size} characters")
                         if size < 15000:
-                            with open(f"{output_dir}/{name}", "r", encoding="utf-8") as f:
+                            with open(f"{result.get('output_dir', output_dir)}/{name}", "r", encoding="utf-8") as f:
                                 code_content = f.read()
                             st.code(code_content, language="python")
 
@@ -71,7 +123,7 @@ if st.button("Run Nexus Pipeline"):
 
 # # Try to import your main pipeline (LangGraph or other)
 # try:
-#     from nexus_pipeline import run_pipeline
+#     from nexus_pipeline import run_pipeline, resume
 # except Exception as e:
 #     print(f"⚠️ Could not import NexusPipeline: {e}")
 #     NexusPipeline = None
@@ -0,0 +1,9 @@
+import asyncio
+from typing import Any
+
+
+async def ainvoke(llm, prompt: str) -> Any:
+    """llm.ainvoke(prompt); clients without native async (mocks) run .invoke on a worker thread."""
+    if hasattr(llm, "ainvoke"):
+        return await llm.ainvoke(prompt)
+    return await asyncio.to_thread(llm.invoke, prompt)
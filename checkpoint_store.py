@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional
+
+RUN_FILE = "run.json"
+
+# Pipeline stages in execution order; each is checkpointed once it succeeds.
+STAGES = ["enhanced_prompt", "prompt_validation", "plan", "plan_validation", "code_generation"]
+
+
+class CheckpointStore:
+    """
+    Pipeline Checkpoints
+    --------------------
+    - One directory per run under base_dir, holding the run's parameters (run.json)
+      and one JSON file per completed stage
+    - Every file is written to a temp file and renamed, so a crash never leaves a
+      half-written checkpoint behind
+    - Per-component code is checkpointed by WriterAgent's manifest in the output
+      directory; this store only records which components finished
+    - Old runs are pruned whenever a new one starts: beyond `max_runs`, or untouched
+      for more than `max_age_s`
+    """
+
+    def __init__(
+        self,
+        base_dir: str = "./.nexus_runs",
+        max_runs: Optional[int] = 200,
+        max_age_s: Optional[float] = 30 * 86400.0
+    ):
+        """
+        Args:
+            base_dir: directory holding one subdirectory per run.
+            max_runs: most runs kept (newest first); None keeps any number.
+            max_age_s: runs not written to for longer are removed; None keeps them.
+        """
+        self.base_dir = base_dir
+        self.max_runs = max_runs
+        self.max_age_s = max_age_s
+
+    def _run_dir(self, run_id: str) -> str:
+        return os.path.join(self.base_dir, run_id)
+
+    def _write(self, run_id: str, filename: str, data: Any):
+        run_dir = self._run_dir(run_id)
+        os.makedirs(run_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=run_dir, prefix=f".{filename}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, os.path.join(run_dir, filename))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _read(self, run_id: str, filename: str) -> Optional[Any]:
+        path = os.path.join(self._run_dir(run_id), filename)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def new_run(self, params: Dict[str, Any]) -> str:
+        """Register a run and return its ID (sortable by start time)."""
+        self.prune()
+        run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self._write(run_id, RUN_FILE, {"run_id": run_id, "created_at": time.time(), "params": params})
+        return run_id
+
+    def prune(self) -> List[str]:
+        """Remove runs past max_age_s and the oldest runs beyond max_runs; returns their IDs."""
+        now = time.time()
+        runs = self.list_runs()
+        removed = []
+        for index, run_id in enumerate(reversed(runs)):
+            run_dir = self._run_dir(run_id)
+            try:
+                age = now - os.path.getmtime(run_dir)
+            except FileNotFoundError:
+                continue
+            # Keep room for the run about to be created.
+            too_many = self.max_runs is not None and index >= max(self.max_runs - 1, 0)
+            too_old = self.max_age_s is not None and age > self.max_age_s
+            if too_many or too_old:
+                shutil.rmtree(run_dir, ignore_errors=True)
+                removed.append(run_id)
+        return removed
+
+    def run_params(self, run_id: str) -> Dict[str, Any]:
+        """Parameters the run was started with; raises KeyError for an unknown run."""
+        run = self._read(run_id, RUN_FILE)
+        if run is None:
+            raise KeyError(f"Unknown run '{run_id}'.")
+        return run["params"]
+
+    def save(self, run_id: str, stage: str, data: Any):
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage '{stage}'. Expected one of {STAGES}.")
+        self._write(run_id, f"{stage}.json", {"stage": stage, "saved_at": time.time(), "data": data})
+
+    def load(self, run_id: str, stage: str) -> Optional[Any]:
+        """A completed stage's output, or None if the stage has not completed."""
+        checkpoint = self._read(run_id, f"{stage}.json")
+        return checkpoint["data"] if checkpoint is not None else None
+
+    def mark_component(self, run_id: str, component: str):
+        """Record that one component's code was written during code generation."""
+        done = self._read(run_id, "components.json") or []
+        if component not in done:
+            done.append(component)
+            self._write(run_id, "components.json", done)
+
+    def completed_components(self, run_id: str) -> List[str]:
+        return self._read(run_id, "components.json") or []
+
+    def first_incomplete_stage(self, run_id: str) -> Optional[str]:
+        """The stage a resume starts from; None once the run has finished."""
+        for stage in STAGES:
+            if self.load(run_id, stage) is None:
+                return stage
+        return None
+
+    def list_runs(self) -> List[str]:
+        if not os.path.isdir(self.base_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.base_dir)
+            if os.path.exists(os.path.join(self.base_dir, name, RUN_FILE))
+        )
@@ -0,0 +1,87 @@
+import re
+import ast
+from typing import Dict, Any, List
+
+
+def _norm(name: str) -> str:
+    """Compare names loosely: "weather_fetcher", "WeatherFetcher" and "weatherfetcher" are equal."""
+    return re.sub(r"[^a-z0-9]", "", str(name).lower())
+
+
+def component_dependencies(components: Dict[str, Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    Map each component to the other components it depends on.
+    External dependencies (libraries, APIs) that are not components are ignored.
+    """
+    by_norm = {_norm(name): name for name in components}
+    graph = {}
+    for name, details in components.items():
+        deps = (details.get("dependencies") or []) if isinstance(details, dict) else []
+        if isinstance(deps, (str, dict)):
+            deps = [deps]
+
+        resolved = []
+        for dep in deps:
+            dep_name = dep.get("name") if isinstance(dep, dict) else dep
+            target = by_norm.get(_norm(dep_name)) if dep_name else None
+            if target and target != name and target not in resolved:
+                resolved.append(target)
+        graph[name] = resolved
+    return graph
+
+
+def topological_waves(components: Dict[str, Dict[str, Any]]) -> List[List[str]]:
+    """
+    Group components into waves: every component's dependencies are in earlier waves,
+    so each wave can be generated in parallel. Plan order is kept within a wave.
+    Raises ValueError on a dependency cycle.
+    """
+    graph = component_dependencies(components)
+    done = set()
+    waves = []
+
+    while len(done) < len(graph):
+        wave = [name for name, deps in graph.items() if name not in done and all(d in done for d in deps)]
+        if not wave:
+            cycle = sorted(name for name in graph if name not in done)
+            raise ValueError(f"Dependency cycle among components: {', '.join(cycle)}")
+        waves.append(wave)
+        done.update(wave)
+
+    return waves
+
+
+def extract_signatures(code: str) -> str:
+    """
+    Public interface of generated code: top-level classes (with their method
+    signatures) and functions, without bodies. Falls back to a line scan when
+    the code does not parse.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        lines = [
+            line.rstrip().rstrip(":")
+            for line in code.splitlines()
+            if re.match(r"\s*(class|def|async def)\s+\w+", line)
+        ]
+        return "\n".join(lines)
+
+    def signature(node) -> str:
+        prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+        returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+        return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+    lines = []
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            bases = ", ".join(ast.unparse(b) for b in node.bases)
+            lines.append(f"class {node.name}({bases})" if bases else f"class {node.name}")
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and (
+                    not item.name.startswith("_") or item.name == "__init__"
+                ):
+                    lines.append(f"    {signature(item)}")
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and not node.name.startswith("_"):
+            lines.append(signature(node))
+    return "\n".join(lines)
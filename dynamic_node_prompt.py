@@ -1,5 +1,6 @@
 import json
-from typing import Dict, List
+import asyncio
+from typing import Dict, List, Optional, Any
 
 class DynamicPromptNode:
     """Dynamic Prompt Creator"""
@@ -7,9 +8,19 @@ class DynamicPromptNode:
     def __init__(self, rag_manager):
         self.rag = rag_manager
 
-    def generate_prompt(self, user_query: str, k: int = 3) -> str:
-        contexts = self.rag.fetch_context(user_query, k=k)
+    def generate_prompt(self, user_query: str, k: int = 3, filters: Optional[Dict[str, Any]] = None) -> str:
+        contexts = self.rag.fetch_context(user_query, k=k, filters=filters)
+        return self._build_prompt(user_query, contexts)
 
+    async def agenerate_prompt(self, user_query: str, k: int = 3, filters: Optional[Dict[str, Any]] = None) -> str:
+        """generate_prompt with retrieval off the event loop."""
+        if hasattr(self.rag, "afetch_context"):
+            contexts = await self.rag.afetch_context(user_query, k=k, filters=filters)
+        else:
+            contexts = await asyncio.to_thread(self.rag.fetch_context, user_query, k=k, filters=filters)
+        return self._build_prompt(user_query, contexts)
+
+    def _build_prompt(self, user_query: str, contexts: List[Dict]) -> str:
         if not contexts:
             return f"""
 [User Objective]
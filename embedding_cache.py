@@ -0,0 +1,167 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Content-addressed embedding cache
+    ---------------------------------
+    - Wraps any LangChain Embeddings object (Gemini by default)
+    - Keys are sha256(model name, query/document kind, text)
+    - In-memory LRU tier in front of a size-bounded SQLite store
+    - Covers both embed_query and bulk embed_documents
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache_dir: str = "./rag_memory/embedding_cache",
+        max_memory_entries: int = 2048,
+        max_disk_entries: int = 100_000,
+        model_name: Optional[str] = None
+    ):
+        """
+        Args:
+            embeddings: the underlying embeddings client.
+            cache_dir: directory for the SQLite backing store.
+            max_memory_entries: LRU capacity of the in-memory tier.
+            max_disk_entries: rows kept on disk before least-recently-used rows are evicted.
+            model_name: cache namespace; defaults to the wrapped client's `model` attribute.
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name or getattr(embeddings, "model", None) or type(embeddings).__name__
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "embeddings.sqlite"), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._disk_entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _key(self, kind: str, text: str) -> str:
+        digest = hashlib.sha256()
+        for part in (self.model_name, kind, text):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Resolve keys from memory first, then from disk in one query per 500 keys."""
+        found = {}
+        missing = []
+        for key in keys:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                found[key] = vector
+            else:
+                missing.append(key)
+
+        now = time.time()
+        for start in range(0, len(missing), 500):
+            batch = missing[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            for key, blob in rows:
+                vector = array("f", blob).tolist()
+                found[key] = vector
+                self._remember(key, vector)
+            if rows:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key, _ in rows]
+                )
+        if missing:
+            self._conn.commit()
+        return found
+
+    def _store(self, items: Dict[str, List[float]]):
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+            [(key, array("f", vector).tobytes(), now) for key, vector in items.items()]
+        )
+        self._disk_entries += len(items)
+        if self._disk_entries > self.max_disk_entries:
+            # Evict down to 90% so eviction is amortized over many inserts.
+            keep = int(self.max_disk_entries * 0.9)
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (self._disk_entries - keep,)
+            )
+            self._disk_entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self._conn.commit()
+
+        for key, vector in items.items():
+            self._remember(key, vector)
+
+    def _embed(self, kind: str, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(kind, t) for t in texts]
+
+        with self._lock:
+            found = self._lookup(keys)
+
+        # Embed each distinct missing text once, in a single upstream call.
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in pending:
+                pending[key] = text
+
+        with self._lock:
+            self.hits += len(keys) - sum(1 for key in keys if key in pending)
+            self.misses += len(pending)
+
+        if pending:
+            if kind == "query":
+                vectors = [self.embeddings.embed_query(text) for text in pending.values()]
+            else:
+                vectors = self.embeddings.embed_documents(list(pending.values()))
+            fresh = {key: list(vector) for key, vector in zip(pending.keys(), vectors)}
+            with self._lock:
+                self._store(fresh)
+            found.update(fresh)
+
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed("document", texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed("query", [text])[0]
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and tier sizes."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": self._disk_entries
+            }
@@ -0,0 +1,147 @@
+import math
+from typing import Optional
+
+import numpy as np
+import faiss
+
+
+# Index types RAGManager can migrate to once the corpus outgrows an exact scan.
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+
+def _default_nlist(n_vectors: int) -> int:
+    """~4*sqrt(n) inverted lists, keeping >= 39 training points per centroid."""
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+
+
+# k-means wants >= 39 training points per centroid; PQ trains 2**nbits centroids
+# per sub-quantizer, so small corpora get fewer bits per code, down to 4.
+PQ_MIN_NBITS = 4
+PQ_MAX_NBITS = 8
+
+
+def _default_pq_nbits(n_vectors: int) -> int:
+    """Bits per PQ code that n_vectors can train: 8 from ~10k vectors, 4 at the minimum."""
+    nbits = int(math.log2(max(n_vectors, 1) / 39)) if n_vectors >= 39 else 0
+    return max(PQ_MIN_NBITS, min(PQ_MAX_NBITS, nbits))
+
+
+def min_training_vectors(index_type: str) -> int:
+    """Fewest vectors an index type can be trained on without starving its k-means."""
+    if index_type == "ivf_pq":
+        return 39 * 2 ** PQ_MIN_NBITS
+    if index_type == "ivf_flat":
+        return 39
+    return 0
+
+
+def _default_pq_m(dim: int) -> int:
+    """Largest sub-quantizer count <= 64 that divides dim with >= 4 dims per code."""
+    for m in range(min(64, dim // 4), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def factory_string(
+    index_type: str,
+    dim: int,
+    n_vectors: int,
+    nlist: Optional[int] = None,
+    hnsw_m: int = 32,
+    pq_m: Optional[int] = None,
+    pq_nbits: Optional[int] = None
+) -> str:
+    """Translate a RAGManager index type into a faiss.index_factory description."""
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m},Flat"
+
+    nlist = nlist or _default_nlist(n_vectors)
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{nlist},PQ{pq_m or _default_pq_m(dim)}x{pq_nbits or _default_pq_nbits(n_vectors)}"
+
+    raise ValueError(f"Unknown index type '{index_type}'. Expected one of {INDEX_TYPES}.")
+
+
+def is_flat(index) -> bool:
+    return isinstance(faiss.downcast_index(index), faiss.IndexFlat)
+
+
+def tune_index(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """Apply search-time knobs; settings that do not apply to the index type are ignored."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        if nprobe:
+            ivf.nprobe = min(nprobe, ivf.nlist)
+        return
+
+    hnsw = faiss.downcast_index(index)
+    if isinstance(hnsw, faiss.IndexHNSW) and ef_search:
+        hnsw.hnsw.efSearch = ef_search
+
+
+def build_index(
+    index_type: str,
+    vectors: np.ndarray,
+    nlist: Optional[int] = None,
+    hnsw_m: int = 32,
+    pq_m: Optional[int] = None,
+    pq_nbits: Optional[int] = None,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None
+):
+    """
+    Build, train and fill an index of the requested type from accumulated vectors.
+    Insertion order is preserved, so positions stay aligned with index_to_docstore_id.
+    Raises ValueError when there are too few vectors to train the index type.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n_vectors, dim = vectors.shape
+    if n_vectors < min_training_vectors(index_type):
+        raise ValueError(
+            f"A {index_type} index needs at least {min_training_vectors(index_type)} vectors to train, got {n_vectors}."
+        )
+
+    index = faiss.index_factory(dim, factory_string(index_type, dim, n_vectors, nlist, hnsw_m, pq_m, pq_nbits))
+    if not index.is_trained:
+        index.train(vectors)
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        # Keep reconstruct() available for compaction and dedupe checks.
+        ivf.make_direct_map()
+
+    index.add(vectors)
+    tune_index(index, nprobe=nprobe, ef_search=ef_search)
+    return index
+
+
+def all_vectors(index) -> np.ndarray:
+    """Reconstruct every stored vector, in insertion order."""
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype="float32")
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def invlists_to_ram(index):
+    """
+    Swap an IVF index's inverted lists (e.g. read-only memory-mapped OnDiskInvertedLists)
+    for in-RAM ArrayInvertedLists holding the same entries, making the index writable.
+    """
+    ivf = faiss.extract_index_ivf(index)
+    source = ivf.invlists
+    lists = faiss.ArrayInvertedLists(ivf.nlist, ivf.code_size)
+    for list_no in range(ivf.nlist):
+        size = source.list_size(list_no)
+        if size == 0:
+            continue
+        ids = faiss.rev_swig_ptr(source.get_ids(list_no), size).copy()
+        codes = faiss.rev_swig_ptr(source.get_codes(list_no), size * ivf.code_size).copy()
+        lists.add_entries(list_no, size, faiss.swig_ptr(ids), faiss.swig_ptr(codes))
+    ivf.replace_invlists(lists, True)
+    # The index now owns the new lists; keep Python from freeing them.
+    lists.this.disown()
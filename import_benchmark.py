@@ -0,0 +1,78 @@
+# import_benchmark.py
+# Startup budget check
+# --------------------
+# Imports each entry module in a fresh interpreter several times and fails when
+# the median import time exceeds the budget. Heavy clients (Gemini embeddings,
+# AzureChatOpenAI, LangChain FAISS) must stay out of module import.
+#
+# Example:
+#     python import_benchmark.py
+#     python import_benchmark.py --budget-ms 300 nexus_pipeline rag_manager
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+from typing import List, Optional, Tuple
+
+DEFAULT_MODULES = ["nexus_pipeline", "rag_manager", "llm_validator", "reader_agent", "writer_agent"]
+DEFAULT_BUDGET_MS = float(os.getenv("NEXUS_IMPORT_BUDGET_MS", "400"))
+
+_TIMER = "import time as _t; _s = _t.perf_counter(); import {module}; print((_t.perf_counter() - _s) * 1000)"
+
+
+def measure_import(module: str, runs: int = 5) -> float:
+    """Median wall-clock import time of `module` in milliseconds, each run in a fresh interpreter."""
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", _TIMER.format(module=module)],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def slowest_imports(module: str, top: int = 8) -> List[Tuple[int, str]]:
+    """Largest cumulative entries from `python -X importtime` for diagnosing a blown budget."""
+    out = subprocess.run(
+        [sys.executable, "-W", "ignore", "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    entries = []
+    for line in out.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            entries.append((int(parts[1]), parts[2].rstrip()))
+    return sorted(entries, reverse=True)[:top]
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Enforce the module import-time budget.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.modules:
+        elapsed = measure_import(module, runs=args.runs)
+        status = "ok" if elapsed <= args.budget_ms else "OVER BUDGET"
+        print(f"{module:<20} {elapsed:8.1f} ms  (budget {args.budget_ms:.0f} ms)  {status}")
+
+        if elapsed > args.budget_ms:
+            failed = True
+            for cumulative_us, name in slowest_imports(module):
+                print(f"    {cumulative_us / 1000:8.1f} ms  {name.strip()}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import re
+import math
+import threading
+from array import array
+from typing import List, Dict, Tuple, Optional, Hashable
+
+import numpy as np
+
+
+_WORD = re.compile(r"[A-Za-z0-9]+")
+_CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Code-aware tokenizer: every identifier is kept whole (lowercased) and also split
+    into its snake_case / camelCase parts, so "CrewAI" matches "crewai" and "crew",
+    and "ModuleNotFoundError" matches "modulenotfounderror" and "module".
+    """
+    tokens = []
+    for word in _WORD.findall(text):
+        lower = word.lower()
+        tokens.append(lower)
+        parts = _CAMEL.findall(word)
+        if len(parts) > 1:
+            tokens.extend(p.lower() for p in parts)
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings: List[List[Hashable]], k: int = 60) -> List[Tuple[Hashable, float]]:
+    """Fuse ranked id lists: score(d) = sum over lists of 1 / (k + rank)."""
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, 1):
+            scores[doc] = scores.get(doc, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """
+    BM25 lexical index
+    ------------------
+    - Postings are precomputed per term as parallel array('I') of positions and term frequencies
+    - Document lengths live in one array('I'); search scores only the query terms'
+      posting lists, vectorized with numpy
+    - Positions match the FAISS positions of the same insights
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._doc_len = array("I")
+        self._total_len = 0
+        # numpy views export the arrays' buffers, which cannot be resized while a view
+        # is alive; search copies out of the views under this lock.
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def __getstate__(self):
+        # Pickled next to the FAISS snapshot so a load does not re-tokenize the corpus.
+        with self._lock:
+            state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def add(self, position: int, text: str):
+        """Index a document; positions must be added in order, starting at 0."""
+        if position != len(self._doc_len):
+            raise ValueError(f"Expected position {len(self._doc_len)}, got {position}.")
+
+        counts: Dict[str, int] = {}
+        tokens = tokenize(text)
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+
+        with self._lock:
+            for token, tf in counts.items():
+                docs, tfs = self._postings.setdefault(token, (array("I"), array("I")))
+                docs.append(position)
+                tfs.append(tf)
+            self._doc_len.append(len(tokens))
+            self._total_len += len(tokens)
+
+    def add_many(self, start: int, texts: List[str]):
+        for offset, text in enumerate(texts):
+            self.add(start + offset, text)
+
+    @classmethod
+    def from_store(cls, db) -> "BM25Index":
+        """Rebuild from a LangChain FAISS store's docstore, in position order."""
+        index = cls()
+        for position in range(len(db.index_to_docstore_id)):
+            doc = db.docstore.search(db.index_to_docstore_id[position])
+            index.add(position, getattr(doc, "page_content", ""))
+        return index
+
+    def search(self, query: str, k: int, candidates: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Top-k (position, BM25 score), optionally restricted to sorted candidate positions
+        (as returned by MetadataIndex.candidates). Only the query terms' posting lists
+        are scored, so the cost follows their document frequencies, not the corpus size.
+        """
+        terms = set(tokenize(query))
+        if candidates is not None and not len(candidates):
+            return []
+
+        with self._lock:
+            n_docs = len(self._doc_len)
+            postings = [self._postings[t] for t in terms if t in self._postings]
+            if not n_docs or not postings:
+                return []
+
+            # Postings of common terms ("error", "import") can cover much of the corpus;
+            # past that point one dense accumulator is cheaper than merging sparse hits.
+            dense = sum(len(docs) for docs, _ in postings) * 8 >= n_docs
+            scores = np.zeros(n_docs, dtype=np.float32) if dense else None
+            hit_docs, hit_scores = [], []
+
+            doc_len = np.frombuffer(self._doc_len, dtype=np.uint32)
+            avg_len = self._total_len / n_docs
+            for posting_docs, posting_tfs in postings:
+                docs = np.frombuffer(posting_docs, dtype=np.uint32).astype(np.int64)
+                tfs = np.frombuffer(posting_tfs, dtype=np.uint32).astype(np.float32)
+                idf = math.log(1.0 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                if candidates is not None and not dense:
+                    at = np.minimum(np.searchsorted(candidates, docs), len(candidates) - 1)
+                    keep = candidates[at] == docs
+                    docs, tfs = docs[keep], tfs[keep]
+                norm = self.k1 * (1.0 - self.b + self.b * doc_len[docs] / avg_len)
+                contribution = idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+                if dense:
+                    scores[docs] += contribution
+                else:
+                    hit_docs.append(docs)
+                    hit_scores.append(contribution)
+
+        if dense:
+            hits = np.flatnonzero(scores) if candidates is None else candidates[scores[candidates] > 0]
+            scores = scores[hits]
+        else:
+            hits, inverse = np.unique(np.concatenate(hit_docs), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(hit_scores))
+        if len(hits) > k:
+            top = np.argpartition(-scores, k)[:k]
+            hits, scores = hits[top], scores[top]
+        order = np.argsort(-scores)
+        return [(int(p), float(s)) for p, s in zip(hits[order], scores[order])]
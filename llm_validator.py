@@ -1,16 +1,60 @@
 import json
-from typing import Dict, Any, Optional, List
-from jsonschema import validate as jsonschema_validate, ValidationError as JSONSchemaValidationError
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Tuple, Iterator, Union, TYPE_CHECKING
+
+from async_support import ainvoke
+from safety_scanner import get_scanner
+from schema_registry import SchemaRegistry, default_registry
+from response_cache import TTLCache, cache_key, model_identity
+
+if TYPE_CHECKING:
+    from prescreen import LocalPrescreen
 
 SENSITIVE_KEYWORDS = [
     "hack", "exploit", "bypass", "malware", "injection",
     "attack", "phishing", "illegal", "bomb", "terror", "kill"
 ]
 
+# One pending LLM check: (session, report to complete, single-item check prompt).
+CheckJob = Tuple["ValidationSession", Dict[str, Any], str]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting prompts."""
+    return len(text) // 4 + 1
+
+
+def _parse_verdict(text: str) -> Any:
+    """Judge reply as JSON, tolerating code fences or prose around the outermost object."""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            raise
+        return json.loads(text[start:end + 1])
+
 class LLMValidator:
-    def __init__(self, llm_client, max_length: int = 2500):
+    def __init__(
+        self,
+        llm_client,
+        max_length: int = 2500,
+        sensitive_keywords: Optional[List[str]] = None,
+        schema_registry: Optional[SchemaRegistry] = None,
+        verdict_cache: Optional[TTLCache] = None,
+        prescreen: Optional["LocalPrescreen"] = None
+    ):
         self.llm = llm_client
         self.max_length = max_length
+        # Each schema is compiled once and reused across calls and validators.
+        self.schemas = schema_registry or default_registry
+        # Compiled once per keyword set and shared by every validator using it.
+        self.scanner = get_scanner(sensitive_keywords or SENSITIVE_KEYWORDS)
+        # LLM verdicts keyed by (check prompt, model); a PersistentTTLCache keeps them across restarts.
+        self.verdict_cache = verdict_cache
+        # Tiered mode: the LLM judge only sees responses the local pre-screen is unsure about.
+        self.prescreen = prescreen
 
     def _try_json(self, text: str) -> Optional[Any]:
         try:
@@ -19,30 +63,23 @@ class LLMValidator:
             return None
 
     def _validate_schema(self, data: Any, schema: Dict) -> Optional[str]:
-        try:
-            jsonschema_validate(instance=data, schema=schema)
-            return None
-        except JSONSchemaValidationError as e:
-            return str(e)
+        """First violation only; ValidationSession.iter_schema_errors() lists the rest on demand."""
+        return self.schemas.compile(schema).first_error(data)
 
     def _scan_safety(self, text: str) -> List[str]:
-        issues = []
-        lower = text.lower()
-        for word in SENSITIVE_KEYWORDS:
-            if word in lower:
-                issues.append(word)
-        return issues
+        return self.scanner.terms(text)[0]
 
-    def validate_response(
+    def _local_report(
         self,
         response_text: str,
-        *,
-        expected_schema: Optional[Dict] = None,
-        instruction: Optional[str] = None,
-        require_json: bool = False,
-        run_llm_check: bool = True
+        expected_schema: Optional[Dict],
+        require_json: bool,
+        parsed: Optional[Any] = None
     ) -> Dict[str, Any]:
-
+        """
+        Length, truncation, JSON/schema and keyword safety checks; no LLM call.
+        `parsed` is the already-decoded response_text, when the caller has it.
+        """
         report = {
             "status": "pass",
             "scores": {"format": 1.0, "instruction_fidelity": 1.0, "safety": 1.0},
@@ -61,9 +98,9 @@ class LLMValidator:
             report["issues"].append("Possible truncation detected")
             report["scores"]["format"] -= 0.2
 
-        parsed = None
         if require_json or expected_schema:
-            parsed = self._try_json(response_text)
+            if parsed is None:
+                parsed = self._try_json(response_text)
             if not parsed:
                 report["issues"].append("Not valid JSON")
                 report["scores"]["format"] = 0.0
@@ -77,15 +114,16 @@ class LLMValidator:
                         report["scores"]["format"] = 0.5
                         report["status"] = "warn"
 
-        safety_hits = self._scan_safety(response_text)
+        safety_hits, positions = self.scanner.terms(response_text)
         if safety_hits:
-            report["issues"].append({"unsafe_terms": safety_hits})
+            report["issues"].append({"unsafe_terms": safety_hits, "positions": positions})
             report["scores"]["safety"] = 0.0
             report["status"] = "fail"
 
-        if run_llm_check and instruction:
-            try:
-                check_prompt = f"""
+        return report
+
+    def _check_prompt(self, response_text: str, instruction: str) -> str:
+        return f"""
 You are a strict validator.
 
 Compare the following LLM output against the given user instruction.
@@ -101,28 +139,390 @@ Instruction:
 LLM Output:
 {response_text}
 """
-                result = self.llm.invoke(check_prompt)
-                result_text = getattr(result, "content", None) or getattr(result, "text", str(result))
-                feedback = json.loads(result_text)
-                report["llm_feedback"] = feedback
-
-                if "instruction_fidelity_score" in feedback:
-                    fidelity = float(feedback["instruction_fidelity_score"])
-                    report["scores"]["instruction_fidelity"] = fidelity
-                    if fidelity < 0.6:
-                        report["status"] = "warn"
-                        report["issues"].append("Low instruction fidelity")
 
-                if "safety_score" in feedback:
-                    sscore = float(feedback["safety_score"])
-                    report["scores"]["safety"] = sscore
-                    if sscore < 0.5:
-                        report["status"] = "fail"
-                        report["issues"].append("Low safety score")
+    def _verdict_key(self, prompt: str) -> str:
+        # The check prompt embeds the response and the instruction.
+        return cache_key(prompt, model_identity(self.llm))
+
+    def _cached_verdict(self, prompt: str) -> Optional[Dict[str, Any]]:
+        if self.verdict_cache is None:
+            return None
+        cached = self.verdict_cache.get(self._verdict_key(prompt))
+        return json.loads(cached) if cached is not None else None
+
+    def _batch_prompt(self, jobs: List[CheckJob]) -> str:
+        items = "\n".join(
+            f"""
+### Item {n}
+Instruction:
+{session.instruction}
+
+LLM Output:
+{session.response_text}
+"""
+            for n, (session, _, _) in enumerate(jobs, start=1)
+        )
+        return f"""
+You are a strict validator.
+
+For each numbered item below, compare the LLM output against its user instruction.
+Rate each item:
+ - instruction_fidelity_score (0.0–1.0)
+ - safety_score (0.0–1.0)
+ - suggestions (list of improvements)
+Return a valid JSON object only, mapping every item number to its ratings,
+e.g. {{"1": {{"instruction_fidelity_score": 0.9, "safety_score": 1.0, "suggestions": []}}}}.
+{items}"""
+
+    def _apply_llm_feedback(self, report: Dict[str, Any], result: Any, prompt: Optional[str] = None):
+        """Merge the validator LLM's verdict into the report; cache it under `prompt` when given."""
+        result_text = getattr(result, "content", None) or getattr(result, "text", str(result))
+        feedback = _parse_verdict(result_text)
+        self._merge_feedback(report, feedback)
+        if prompt is not None and self.verdict_cache is not None:
+            self.verdict_cache.put(self._verdict_key(prompt), json.dumps(feedback))
+
+    def _merge_feedback(self, report: Dict[str, Any], feedback: Dict[str, Any]):
+        report["llm_feedback"] = feedback
+
+        if "instruction_fidelity_score" in feedback:
+            fidelity = float(feedback["instruction_fidelity_score"])
+            report["scores"]["instruction_fidelity"] = fidelity
+            if fidelity < 0.6:
+                report["status"] = "warn"
+                report["issues"].append("Low instruction fidelity")
+
+        if "safety_score" in feedback:
+            sscore = float(feedback["safety_score"])
+            report["scores"]["safety"] = sscore
+            if sscore < 0.5:
+                report["status"] = "fail"
+                report["issues"].append("Low safety score")
+
+        if "suggestions" in feedback:
+            report["suggestions"].extend(feedback["suggestions"])
+
+    def _apply_prescreen(self, report: Dict[str, Any], screen: Dict[str, Any]) -> bool:
+        """Record the pre-screen result; True when it settled the check without the LLM."""
+        report["prescreen"] = screen
+        if screen["decision"] == "escalate":
+            return False
+        report["scores"]["instruction_fidelity"] = screen["score"]
+        if screen["decision"] == "fail":
+            if report["status"] == "pass":
+                report["status"] = "warn"
+            report["issues"].append("Low instruction fidelity (local pre-screen)")
+        return True
+
+    def session(
+        self,
+        response_text: str,
+        *,
+        expected_schema: Optional[Dict] = None,
+        instruction: Optional[str] = None,
+        require_json: bool = False,
+        parsed: Optional[Any] = None,
+        stage: Optional[str] = None
+    ) -> "ValidationSession":
+        """
+        Run the local checks once and return a session that can add the LLM check
+        on top without re-parsing, re-validating or re-scanning the response.
+        `stage` selects the pre-screen thresholds, when a pre-screen is configured.
+        """
+        return ValidationSession(self, response_text, expected_schema, instruction, require_json, parsed, stage)
+
+    def validate_response(
+        self,
+        response_text: str,
+        *,
+        expected_schema: Optional[Dict] = None,
+        instruction: Optional[str] = None,
+        require_json: bool = False,
+        run_llm_check: bool = True,
+        stage: Optional[str] = None
+    ) -> Dict[str, Any]:
+        session = self.session(
+            response_text,
+            expected_schema=expected_schema,
+            instruction=instruction,
+            require_json=require_json,
+            stage=stage
+        )
+        return session.full_report() if run_llm_check else session.local_report()
+
+    async def avalidate_response(
+        self,
+        response_text: str,
+        *,
+        expected_schema: Optional[Dict] = None,
+        instruction: Optional[str] = None,
+        require_json: bool = False,
+        run_llm_check: bool = True,
+        stage: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """validate_response with the LLM check awaited via ainvoke."""
+        session = self.session(
+            response_text,
+            expected_schema=expected_schema,
+            instruction=instruction,
+            require_json=require_json,
+            stage=stage
+        )
+        return await session.afull_report() if run_llm_check else session.local_report()
+
+    def _prepare_many(self, items: List[Union[str, Dict[str, Any]]]) -> List["ValidationSession"]:
+        """Local checks for every item; a str item is just the response text."""
+        return [self.session(**({"response_text": item} if isinstance(item, str) else item)) for item in items]
+
+    def _pending_checks(self, sessions: List["ValidationSession"]) -> List[CheckJob]:
+        """Sessions that still need the LLM judge (not cached, not settled by the pre-screen)."""
+        jobs = []
+        for session in sessions:
+            request = session._check_request()
+            if request is not None:
+                jobs.append((session, *request))
+        return jobs
+
+    def _pack(self, jobs: List[CheckJob], token_budget: int, max_batch_items: int) -> List[List[CheckJob]]:
+        """Greedily group checks, in order, into judge prompts that stay under token_budget."""
+        overhead = estimate_tokens(self._batch_prompt([]))
+        batches: List[List[CheckJob]] = []
+        current: List[CheckJob] = []
+        used = overhead
+        for job in jobs:
+            cost = estimate_tokens(job[0].instruction or "") + estimate_tokens(job[0].response_text) + 16
+            if current and (used + cost > token_budget or len(current) >= max_batch_items):
+                batches.append(current)
+                current, used = [], overhead
+            current.append(job)
+            used += cost
+        if current:
+            batches.append(current)
+        return batches
+
+    def _apply_batch_result(self, batch: List[CheckJob], result: Any) -> List[CheckJob]:
+        """Merge per-item verdicts from one packed judge call; returns the items it left unrated."""
+        result_text = getattr(result, "content", None) or getattr(result, "text", str(result))
+        try:
+            verdicts = _parse_verdict(result_text)
+        except json.JSONDecodeError:
+            return batch
+        if not isinstance(verdicts, dict):
+            return batch
 
-                if "suggestions" in feedback:
-                    report["suggestions"].extend(feedback["suggestions"])
+        missing = []
+        for n, (session, report, prompt) in enumerate(batch, start=1):
+            feedback = verdicts.get(str(n))
+            try:
+                if not isinstance(feedback, dict):
+                    raise ValueError(f"no verdict for item {n}")
+                merged = ValidationSession._copy(report)
+                self._merge_feedback(merged, feedback)
+            except (TypeError, ValueError):
+                missing.append((session, report, prompt))
+                continue
+            if self.verdict_cache is not None:
+                self.verdict_cache.put(self._verdict_key(prompt), json.dumps(feedback))
+            session._full = merged
+        return missing
+
+    @staticmethod
+    def _batch_failed(batch: List[CheckJob], error: Exception):
+        for session, report, _ in batch:
+            report["issues"].append({"llm_feedback_error": str(error)})
+            session._full = report
+
+    def validate_many(
+        self,
+        items: List[Union[str, Dict[str, Any]]],
+        *,
+        run_llm_check: bool = True,
+        pack: bool = True,
+        token_budget: int = 6000,
+        max_batch_items: int = 8,
+        max_concurrency: int = 4
+    ) -> List[Dict[str, Any]]:
+        """
+        Validate several responses with as few LLM judge calls as possible.
+
+        Args:
+            items: response texts, or dicts of validate_response/session keyword
+                arguments (response_text, instruction, expected_schema, require_json, stage).
+            run_llm_check: False returns the local reports only.
+            pack: rate several items per judge prompt (one JSON verdict per item);
+                False sends one prompt per item. Items a packed reply leaves unrated
+                are re-checked one by one.
+            token_budget: estimated tokens allowed per judge prompt.
+            max_batch_items: most items packed into one prompt.
+            max_concurrency: judge calls in flight at once.
+
+        Returns:
+            One report per item, in order.
+        """
+        sessions = self._prepare_many(items)
+        if not run_llm_check:
+            return [s.local_report() for s in sessions]
+
+        jobs = self._pending_checks(sessions)
+        batches = self._pack(jobs, token_budget, max_batch_items) if pack else [[job] for job in jobs]
+
+        def check(batch: List[CheckJob]) -> List[CheckJob]:
+            if len(batch) == 1:
+                session, report, prompt = batch[0]
+                session._run_check(report, prompt)
+                return []
+            try:
+                return self._apply_batch_result(batch, self.llm.invoke(self._batch_prompt(batch)))
             except Exception as e:
-                report["issues"].append({"llm_feedback_error": str(e)})
+                self._batch_failed(batch, e)
+                return []
 
-        return report
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+            leftovers = [job for missing in pool.map(check, batches) for job in missing]
+            list(pool.map(check, [[job] for job in leftovers]))
+
+        return [s.full_report() for s in sessions]
+
+    async def avalidate_many(
+        self,
+        items: List[Union[str, Dict[str, Any]]],
+        *,
+        run_llm_check: bool = True,
+        pack: bool = True,
+        token_budget: int = 6000,
+        max_batch_items: int = 8,
+        max_concurrency: int = 4
+    ) -> List[Dict[str, Any]]:
+        """validate_many with the judge calls awaited via ainvoke."""
+        sessions = self._prepare_many(items)
+        if not run_llm_check:
+            return [s.local_report() for s in sessions]
+
+        jobs = self._pending_checks(sessions)
+        batches = self._pack(jobs, token_budget, max_batch_items) if pack else [[job] for job in jobs]
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def check(batch: List[CheckJob]) -> List[CheckJob]:
+            async with semaphore:
+                if len(batch) == 1:
+                    session, report, prompt = batch[0]
+                    await session._arun_check(report, prompt)
+                    return []
+                try:
+                    return self._apply_batch_result(batch, await ainvoke(self.llm, self._batch_prompt(batch)))
+                except Exception as e:
+                    self._batch_failed(batch, e)
+                    return []
+
+        leftovers = [job for missing in await asyncio.gather(*(check(b) for b in batches)) for job in missing]
+        await asyncio.gather(*(check([job]) for job in leftovers))
+
+        return [await s.afull_report() for s in sessions]
+
+
+class ValidationSession:
+    """
+    One response under validation: the local report is computed once at creation,
+    the LLM check at most once, on demand. Reports handed out are copies, so callers
+    may annotate them freely.
+    """
+
+    def __init__(
+        self,
+        validator: LLMValidator,
+        response_text: str,
+        expected_schema: Optional[Dict],
+        instruction: Optional[str],
+        require_json: bool,
+        parsed: Optional[Any],
+        stage: Optional[str] = None
+    ):
+        self.validator = validator
+        self.response_text = response_text
+        self.instruction = instruction
+        self.expected_schema = expected_schema
+        self.stage = stage
+        self._local = validator._local_report(response_text, expected_schema, require_json, parsed)
+        self._full: Optional[Dict[str, Any]] = None
+
+    @staticmethod
+    def _copy(report: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            **report,
+            "scores": dict(report["scores"]),
+            "issues": list(report["issues"]),
+            "suggestions": list(report["suggestions"])
+        }
+
+    @property
+    def status(self) -> str:
+        """Status of the most complete report so far."""
+        return (self._full or self._local)["status"]
+
+    def local_report(self) -> Dict[str, Any]:
+        return self._copy(self._local)
+
+    @property
+    def schema_errors(self) -> List[str]:
+        """Schema violation recorded in the report (the first one found)."""
+        return [i["schema_error"] for i in self._local["issues"] if isinstance(i, dict) and "schema_error" in i]
+
+    def iter_schema_errors(self) -> Iterator[str]:
+        """Every schema violation, computed lazily; empty when the response is valid or not JSON."""
+        if self.expected_schema is None or not self.schema_errors:
+            return iter(())
+        return self.validator.schemas.compile(self.expected_schema).iter_errors(self._local["parsed"])
+
+    def _check_request(self) -> Optional[Tuple[Dict[str, Any], str]]:
+        """
+        (report to complete, check prompt), or None when no LLM call is needed:
+        the check already ran, there is no instruction, the verdict is cached, or
+        the local pre-screen is confident either way.
+        """
+        if self._full is not None:
+            return None
+        report = self._copy(self._local)
+        if not self.instruction:
+            self._full = report
+            return None
+        prompt = self.validator._check_prompt(self.response_text, self.instruction)
+        cached = self.validator._cached_verdict(prompt)
+        if cached is not None:
+            self.validator._merge_feedback(report, cached)
+            self._full = report
+            return None
+        prescreen = self.validator.prescreen
+        if prescreen is not None:
+            screen = prescreen.screen(self.response_text, self.instruction, self._local, self.stage)
+            if self.validator._apply_prescreen(report, screen):
+                self._full = report
+                return None
+        return report, prompt
+
+    def _run_check(self, report: Dict[str, Any], prompt: str):
+        try:
+            self.validator._apply_llm_feedback(report, self.validator.llm.invoke(prompt), prompt)
+        except Exception as e:
+            report["issues"].append({"llm_feedback_error": str(e)})
+        self._full = report
+
+    async def _arun_check(self, report: Dict[str, Any], prompt: str):
+        try:
+            self.validator._apply_llm_feedback(report, await ainvoke(self.validator.llm, prompt), prompt)
+        except Exception as e:
+            report["issues"].append({"llm_feedback_error": str(e)})
+        self._full = report
+
+    def full_report(self) -> Dict[str, Any]:
+        """Local report plus the LLM fidelity/safety check (run once per session)."""
+        request = self._check_request()
+        if request is not None:
+            self._run_check(*request)
+        return self._copy(self._full)
+
+    async def afull_report(self) -> Dict[str, Any]:
+        """full_report with the LLM check awaited via ainvoke."""
+        request = self._check_request()
+        if request is not None:
+            await self._arun_check(*request)
+        return self._copy(self._full)
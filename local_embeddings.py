@@ -0,0 +1,107 @@
+import re
+import math
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """
+    Local sentence-transformers backend
+    -----------------------------------
+    - Defaults to all-MiniLM-L6-v2 (384 dims), the model generated_code already uses
+    - Loads the model on first use and encodes in batches on CPU
+    - No network access once the model is in the local Hugging Face cache
+    """
+
+    def __init__(
+        self,
+        model: str = "sentence-transformers/all-MiniLM-L6-v2",
+        batch_size: int = 64,
+        device: str = "cpu",
+        num_threads: Optional[int] = None
+    ):
+        """
+        Args:
+            model: sentence-transformers model name or local path.
+            batch_size: texts per forward pass.
+            device: torch device to run on.
+            num_threads: torch intra-op CPU threads; None keeps the torch default.
+        """
+        self.model = model
+        self.batch_size = batch_size
+        self.device = device
+        self.num_threads = num_threads
+        self._encoder = None
+
+    def _load(self):
+        if self._encoder is None:
+            from sentence_transformers import SentenceTransformer
+
+            if self.num_threads:
+                import torch
+                torch.set_num_threads(self.num_threads)
+            self._encoder = SentenceTransformer(self.model, device=self.device)
+        return self._encoder
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        vectors = self._load().encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic hashing vectorizer
+    --------------------------------
+    - Signed feature hashing of word unigrams and bigrams into `dim` buckets
+    - L2-normalized, identical across processes and machines
+    - Meant for tests and air-gapped boxes where no model can be downloaded
+    """
+
+    _TOKEN = re.compile(r"\w+")
+
+    def __init__(self, dim: int = 384, batch_size: int = 256, max_workers: int = 4):
+        self.dim = dim
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.model = f"hashing-{dim}"
+
+    def _embed_one(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        tokens = self._TOKEN.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector] if norm else vector
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed_one(t) for t in texts]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if len(texts) <= self.batch_size:
+            return self._embed_batch(texts)
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return [vector for batch in pool.map(self._embed_batch, batches) for vector in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_one(text)
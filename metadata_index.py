@@ -0,0 +1,136 @@
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Iterable
+
+import numpy as np
+
+
+# Metadata fields that can be used as fetch_context filters.
+FILTER_FIELDS = ("session_id", "framework", "language", "tags")
+
+
+def _normalize(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip().lower()
+    return value or None
+
+
+def _as_list(value: Any) -> list:
+    """Accept a list, a comma separated string or a single value."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    elif not isinstance(value, (list, tuple, set)):
+        value = [value]
+    return [v for v in (_normalize(item) for item in value) if v]
+
+
+def to_epoch(value: Any) -> Optional[float]:
+    """A timestamp as float epoch seconds: numbers, numeric strings, ISO 8601 strings or datetimes."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        text = str(value).strip()
+        try:
+            return float(text)
+        except ValueError:
+            pass
+        try:
+            moment = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def extract_metadata(insight_package: Dict[str, Any]) -> Dict[str, Any]:
+    """Pull the filterable fields out of an insight package at ingest time."""
+    sys_ctx = insight_package.get("system_context") or {}
+    beh = insight_package.get("behavioral_insights") or {}
+    corr = insight_package.get("corrective_knowledge") or {}
+
+    frameworks = _as_list(beh.get("code_framework_preference") or insight_package.get("framework"))
+    language = (
+        insight_package.get("language")
+        or sys_ctx.get("language")
+        or beh.get("language_preference")
+    )
+
+    return {
+        "session_id": insight_package.get("session_id"),
+        "framework": frameworks[0] if len(frameworks) == 1 else frameworks or None,
+        "language": _normalize(language),
+        "tags": _as_list(corr.get("relevance_tags")),
+        # Always epoch seconds, so timestamps from packages and the ingest-time fallback compare.
+        "timestamp": to_epoch(insight_package.get("timestamp")) or time.time()
+    }
+
+
+class MetadataIndex:
+    """
+    Inverted index over insight metadata
+    ------------------------------------
+    Maps field -> value -> FAISS positions so filtered retrieval can restrict the
+    vector search to matching candidates up front instead of over-fetching.
+    Also maps content hashes to positions for ingest-time dedupe.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, set]] = {field: {} for field in FILTER_FIELDS}
+        self.content_hashes: Dict[str, int] = {}
+
+    def add(self, position: int, metadata: Dict[str, Any]):
+        for field in FILTER_FIELDS:
+            for value in _as_list(metadata.get(field)):
+                self.postings[field].setdefault(value, set()).add(position)
+
+        # Exact-duplicate lookup, including hashes folded in by compaction.
+        for content_hash in [metadata.get("content_hash")] + list(metadata.get("merged_hashes") or []):
+            if content_hash:
+                self.content_hashes[content_hash] = position
+
+    def add_many(self, start: int, metadatas: Iterable[Dict[str, Any]]):
+        for offset, metadata in enumerate(metadatas):
+            self.add(start + offset, metadata)
+
+    @classmethod
+    def from_store(cls, db) -> "MetadataIndex":
+        """Rebuild from a LangChain FAISS store's docstore."""
+        index = cls()
+        for position, doc_id in db.index_to_docstore_id.items():
+            doc = db.docstore.search(doc_id)
+            if hasattr(doc, "metadata"):
+                index.add(position, doc.metadata)
+        return index
+
+    def candidates(self, filters: Dict[str, Any]) -> Optional[np.ndarray]:
+        """
+        Resolve filters into sorted int64 positions.
+        Fields are AND-ed; a list of values for one field is OR-ed.
+        Returns None when no usable filter was given.
+        """
+        result = None
+        for field, wanted in filters.items():
+            if field not in self.postings:
+                raise ValueError(f"Cannot filter on '{field}'. Expected one of {FILTER_FIELDS}.")
+            values = _as_list(wanted)
+            if not values:
+                continue
+
+            matched = set()
+            for value in values:
+                matched |= self.postings[field].get(value, set())
+            result = matched if result is None else result & matched
+            if not result:
+                break
+
+        if result is None:
+            return None
+        return np.fromiter(sorted(result), dtype="int64", count=len(result))
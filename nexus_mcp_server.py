@@ -2,13 +2,17 @@
 import asyncio
 import json
 from fastmcp import FastMCP
-from nexus_pipeline import run_pipeline
+from nexus_pipeline import run_pipeline_async, resume_async
+from pipeline_context import get_default_context
 
 # Initialize the MCP server
 mcp = FastMCP("NEXUS")
 
+# Pooled LLM connections and the memory index are shared by every tool call.
+context = get_default_context()
+
 @mcp.tool()
-def run_nexus_pipeline(query: str) -> str:
+async def run_nexus_pipeline(query: str) -> str:
     """
     Run the full Project Nexus pipeline.
     Args:
@@ -16,8 +20,22 @@ def run_nexus_pipeline(query: str) -> str:
     Returns:
         str: JSON summary of the pipeline result.
     """
-    result = run_pipeline(query)
+    # Awaited on the server's event loop, so concurrent requests do not queue behind each other.
+    result = await run_pipeline_async(query, context=context)
+    return json.dumps(result, indent=2)
+
+@mcp.tool()
+async def resume_nexus_pipeline(run_id: str) -> str:
+    """
+    Resume a Project Nexus run from its first incomplete stage.
+    Args:
+        run_id (str): The "run_id" returned by run_nexus_pipeline.
+    Returns:
+        str: JSON summary of the pipeline result.
+    """
+    result = await resume_async(run_id, context=context)
     return json.dumps(result, indent=2)
 
 if __name__ == "__main__":
+    context.warm_up()
     mcp.run()
@@ -3,37 +3,43 @@
 # -----------------------------------
 # Connects all modules into one sequential flow:
 # RAGManager -> DynamicPromptNode -> LLMValidator -> ReaderAgent -> WriterAgent
+#
+# run_pipeline_async awaits every stage, so one process can serve many runs at
+# once; run_pipeline is its blocking wrapper. Both reuse a long-lived
+# PipelineContext (pooled LLM connections, open memory index) across runs.
 
 import os
 import json
 import sys
-from typing import Optional
+import queue
+import asyncio
+from typing import Optional, Callable, Dict, Any
 
-from rag_manager import RAGManager
 from dynamic_node_prompt import DynamicPromptNode
-from llm_validator import LLMValidator
-from reader_agent import ReaderAgent
+from reader_agent import PLAN_SCHEMA
 from writer_agent import WriterAgent
-from langchain_openai import AzureChatOpenAI
+# make_llm_client moved to pipeline_context; it stays importable from here.
+from pipeline_context import PipelineContext, get_default_context, make_llm_client
 
 
-def make_llm_client() -> AzureChatOpenAI:
-    """
-    Initialize AzureChatOpenAI using environment variables.
-    Adjust this function if you switch to another LLM.
-    """
-    return AzureChatOpenAI(
-        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-        deployment_name=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
-        api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-        temperature=0.7
-    )
-
-
-def run_pipeline(user_query: str, rag_persist_dir: str = "./rag_memory", code_output_dir: str = "./generated_code"):
+async def run_pipeline_async(
+    user_query: str,
+    rag_persist_dir: str = "./rag_memory",
+    code_output_dir: str = "./generated_code",
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    stream: bool = True,
+    context: Optional[PipelineContext] = None,
+    run_id: Optional[str] = None
+):
     """
     Main orchestrator pipeline for the Nexus System.
+    Code generation streams tokens to disk; its progress events (see
+    WriterAgent.iter_system_code) are passed to on_event when given.
+    Shared clients come from `context` (default: get_default_context()); the run
+    itself executes on the context's event loop, where its pooled connections live.
+
+    Every stage's output is checkpointed under a run ID (returned as "run_id").
+    Passing the ID of an earlier run skips its completed stages; see resume().
 
     Steps:
         1. Initialize dependencies (LLM, RAG, Validator, Reader, Writer).
@@ -44,90 +50,142 @@ def run_pipeline(user_query: str, rag_persist_dir: str = "./rag_memory", code_ou
         6. Generate component code and orchestrator using WriterAgent.
     """
 
-    # Initialize Azure LLM
-    llm_client = make_llm_client()
+    context = context or get_default_context()
+    if not context.on_loop():
+        # Hop onto the context's loop; events are delivered back on the caller's loop.
+        caller = asyncio.get_running_loop()
+        forward = (lambda event: caller.call_soon_threadsafe(on_event, event)) if on_event else None
+        return await context.arun(run_pipeline_async(
+            user_query,
+            rag_persist_dir=rag_persist_dir,
+            code_output_dir=code_output_dir,
+            on_event=forward,
+            stream=stream,
+            context=context,
+            run_id=run_id
+        ))
+
+    checkpoints = context.checkpoints
+    if run_id is None:
+        run_id = checkpoints.new_run({
+            "user_query": user_query,
+            "rag_persist_dir": rag_persist_dir,
+            "code_output_dir": code_output_dir,
+            "stream": stream
+        })
+    print(f"Pipeline run ID: {run_id}")
 
-    # Initialize RAG Manager and Dynamic Prompt Creator
-    rag = RAGManager(persist_dir=rag_persist_dir)
-    dp_node = DynamicPromptNode(rag)
+    # Shared LLM, RAG Manager, Validator and Reader; a Writer per output directory
+    llm_client = context.llm()
+    dp_node = DynamicPromptNode(context.rag(rag_persist_dir))
+    validator = context.validator()
+    reader = context.reader()
+    writer = WriterAgent(
+        llm_client=llm_client,
+        base_output_dir=code_output_dir,
+        auto_save=True,
+        stream=stream,
+        retry_policy=context.retry_policy
+    )
 
-    # Validator, Reader, and Writer
-    validator = LLMValidator(llm_client)
-    reader = ReaderAgent(llm_client=llm_client, validator=validator)
-    writer = WriterAgent(llm_client=llm_client, base_output_dir=code_output_dir, auto_save=True)
+    # Completed runs return their stored summary without doing any work.
+    done = checkpoints.load(run_id, "code_generation")
+    if done is not None:
+        print("Run already completed; returning its checkpointed summary.")
+        return done
 
     # Step 1: Generate enhanced prompt
-    print("Generating enhanced prompt from stored corrective memory.")
-    enhanced_prompt = dp_node.generate_prompt(user_query, k=3)
-    print("Enhanced prompt generated successfully.\n")
+    enhanced_prompt = checkpoints.load(run_id, "enhanced_prompt")
+    if enhanced_prompt is not None:
+        print("Enhanced prompt restored from checkpoint.\n")
+    else:
+        print("Generating enhanced prompt from stored corrective memory.")
+        enhanced_prompt = await dp_node.agenerate_prompt(user_query, k=3)
+        checkpoints.save(run_id, "enhanced_prompt", enhanced_prompt)
+        print("Enhanced prompt generated successfully.\n")
 
     # Step 2: Validate the enhanced prompt
-    print("Validating enhanced prompt for structure and instruction fidelity.")
-    prompt_validation = validator.validate_response(
-        response_text=enhanced_prompt,
-        instruction=user_query,
-        require_json=False,
-        run_llm_check=True
-    )
-    print("Prompt validation report:")
-    print(json.dumps(prompt_validation, indent=2))
+    prompt_validation = checkpoints.load(run_id, "prompt_validation")
+    if prompt_validation is not None:
+        print("Prompt validation restored from checkpoint.")
+    else:
+        print("Validating enhanced prompt for structure and instruction fidelity.")
+        prompt_validation = await validator.avalidate_response(
+            response_text=enhanced_prompt,
+            instruction=user_query,
+            require_json=False,
+            run_llm_check=True,
+            stage="prompt_validation"
+        )
+        print("Prompt validation report:")
+        print(json.dumps(prompt_validation, indent=2))
 
-    if prompt_validation.get("status") == "fail":
-        print("Prompt validation failed. Exiting pipeline.")
-        return {
-            "success": False,
-            "stage": "prompt_validation",
-            "report": prompt_validation
-        }
+        # Failed stages are not checkpointed, so a resume retries them.
+        if prompt_validation.get("status") == "fail":
+            print("Prompt validation failed. Exiting pipeline.")
+            return {
+                "success": False,
+                "stage": "prompt_validation",
+                "run_id": run_id,
+                "report": prompt_validation
+            }
+        checkpoints.save(run_id, "prompt_validation", prompt_validation)
 
     # Step 3: Use ReaderAgent to generate plan
-    print("\nRequesting ReaderAgent to create system plan.")
-    plan_result = reader.plan_from_prompt(enhanced_prompt, instruction=user_query)
+    plan = checkpoints.load(run_id, "plan")
+    if plan is not None:
+        print("\nSystem plan restored from checkpoint.")
+    else:
+        print("\nRequesting ReaderAgent to create system plan.")
+        plan_result = await reader.aplan_from_prompt(enhanced_prompt, instruction=user_query)
 
-    if not plan_result.get("success"):
-        print("ReaderAgent failed to produce a valid plan.")
-        return {
-            "success": False,
-            "stage": "reader_planning",
-            "error": plan_result.get("error"),
-            "attempts": plan_result.get("attempts"),
-            "validation_report": plan_result.get("validation_report")
-        }
+        if not plan_result.get("success"):
+            print("ReaderAgent failed to produce a valid plan.")
+            return {
+                "success": False,
+                "stage": "reader_planning",
+                "run_id": run_id,
+                "error": plan_result.get("error"),
+                "attempts": plan_result.get("attempts"),
+                "validation_report": plan_result.get("validation_report")
+            }
 
-    plan = plan_result["plan"]
-    print("\nSystem plan created successfully. Proceeding with plan validation.")
+        plan = plan_result["plan"]
+        checkpoints.save(run_id, "plan", plan)
+        print("\nSystem plan created successfully. Proceeding with plan validation.")
+
+        # The reader already validated this plan (schema and LLM check against the
+        # user query); its report is reused instead of validating a third time.
+        reader_report = plan_result.get("validation_report")
+        if reader_report is not None and reader_report.get("status") != "fail":
+            checkpoints.save(run_id, "plan_validation", reader_report)
 
     # Step 4: Validate plan schema and logical structure
-    plan_text = json.dumps(plan)
-    plan_validation = validator.validate_response(
-        response_text=plan_text,
-        expected_schema={
-            "type": "object",
-            "properties": {
-                "framework": {"type": "string"},
-                "language": {"type": "string"},
-                "llm": {"type": "string"},
-                "embedding_model": {"type": "string"},
-                "components": {"type": ["object", "array"]},
-                "termination_policy": {"type": "object"},
-                "files": {"type": ["array", "null"]}
-            },
-            "required": ["framework", "language", "llm", "components"]
-        },
-        instruction="Validate system plan for schema compliance.",
-        require_json=True,
-        run_llm_check=True
-    )
-    print("Plan validation report:")
-    print(json.dumps(plan_validation, indent=2))
+    plan_validation = checkpoints.load(run_id, "plan_validation")
+    if plan_validation is not None:
+        print("Plan validation report (issued by ReaderAgent):")
+        print(json.dumps(plan_validation, indent=2))
+    else:
+        plan_validation = await validator.session(
+            json.dumps(plan),
+            expected_schema=PLAN_SCHEMA,
+            instruction=user_query,
+            require_json=True,
+            parsed=plan,
+            stage="plan_validation"
+        ).afull_report()
+        print("Plan validation report:")
+        print(json.dumps(plan_validation, indent=2))
 
-    if plan_validation.get("status") == "fail":
-        print("Plan validation failed. Exiting pipeline.")
-        return {
-            "success": False,
-            "stage": "plan_validation",
-            "report": plan_validation
-        }
+        if plan_validation.get("status") == "fail":
+            print("Plan validation failed. Exiting pipeline.")
+            return {
+                "success": False,
+                "stage": "plan_validation",
+                "run_id": run_id,
+                "report": plan_validation
+            }
+        checkpoints.save(run_id, "plan_validation", plan_validation)
 
     # Step 5: Normalize components if they are in list format
     if isinstance(plan.get("components"), list):
@@ -138,16 +196,26 @@ def run_pipeline(user_query: str, rag_persist_dir: str = "./rag_memory", code_ou
                 normalized[name] = {k: v for k, v in item.items() if k != "name"}
         plan["components"] = normalized
 
-    # Step 6: Generate actual system code using WriterAgent
+    # Step 6: Generate actual system code using WriterAgent.
+    # Finished components are kept in the writer's manifest, so a resumed run
+    # regenerates only the ones that did not complete.
+    def record(event: Dict[str, Any]):
+        if event["event"] == "component_done":
+            checkpoints.mark_component(run_id, event["component"])
+        if on_event is not None:
+            on_event(event)
+
     print("\nInvoking WriterAgent for code generation.")
     try:
-        write_result = writer.write_system_code(plan)
+        write_result = await writer.awrite_system_code(plan, on_event=record)
     except Exception as e:
         print("WriterAgent encountered an error during code generation.")
         print("Error details:", str(e))
         return {
             "success": False,
             "stage": "code_generation",
+            "run_id": run_id,
+            "completed_components": checkpoints.completed_components(run_id),
             "error": str(e)
         }
 
@@ -156,12 +224,14 @@ def run_pipeline(user_query: str, rag_persist_dir: str = "./rag_memory", code_ou
     file_summaries = []
     for f in write_result.get("files", []):
         name = f.get("name")
-        content = f.get("content", "")
-        file_summaries.append({"name": name, "size": len(content)})
+        # Streamed files are returned by size only; their content is on disk.
+        size = f.get("size", len(f.get("content") or ""))
+        file_summaries.append({"name": name, "size": size})
 
     result_summary = {
         "success": True,
         "stage": "done",
+        "run_id": run_id,
         "user_query": user_query,
         "plan": plan,
         "plan_validation": plan_validation,
@@ -169,25 +239,106 @@ def run_pipeline(user_query: str, rag_persist_dir: str = "./rag_memory", code_ou
         "output_dir": os.path.abspath(code_output_dir)
     }
 
+    checkpoints.save(run_id, "code_generation", result_summary)
     print("\nPipeline executed successfully.")
     return result_summary
 
 
+def run_pipeline(
+    user_query: str,
+    rag_persist_dir: str = "./rag_memory",
+    code_output_dir: str = "./generated_code",
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    stream: bool = True,
+    context: Optional[PipelineContext] = None,
+    run_id: Optional[str] = None
+):
+    """
+    Blocking wrapper around run_pipeline_async. The run executes on the context's
+    event loop; on_event is called on the caller's thread.
+    """
+    context = context or get_default_context()
+    if context.on_loop():
+        raise RuntimeError("run_pipeline() called from the context's event loop; await run_pipeline_async instead.")
+
+    events: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+    future = context.submit(run_pipeline_async(
+        user_query,
+        rag_persist_dir=rag_persist_dir,
+        code_output_dir=code_output_dir,
+        on_event=events.put if on_event else None,
+        stream=stream,
+        context=context,
+        run_id=run_id
+    ))
+    if on_event is None:
+        return future.result()
+
+    while True:
+        try:
+            event = events.get(timeout=0.05)
+        except queue.Empty:
+            if future.done():
+                return future.result()
+            continue
+        on_event(event)
+
+
+async def resume_async(
+    run_id: str,
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    context: Optional[PipelineContext] = None
+):
+    """Continue a checkpointed run from its first incomplete stage, with its original parameters."""
+    context = context or get_default_context()
+    params = context.checkpoints.run_params(run_id)
+    print(f"Resuming run {run_id} from stage: {context.checkpoints.first_incomplete_stage(run_id) or 'done'}")
+    return await run_pipeline_async(**params, on_event=on_event, context=context, run_id=run_id)
+
+
+def resume(
+    run_id: str,
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    context: Optional[PipelineContext] = None
+):
+    """Blocking version of resume_async."""
+    context = context or get_default_context()
+    params = context.checkpoints.run_params(run_id)
+    print(f"Resuming run {run_id} from stage: {context.checkpoints.first_incomplete_stage(run_id) or 'done'}")
+    return run_pipeline(**params, on_event=on_event, context=context, run_id=run_id)
+
+
 def main(argv: Optional[list] = None):
     """
     Entry point for standalone execution.
 
     Example:
         python nexus_pipeline.py "Create me a weather app in LangGraph"
+        python nexus_pipeline.py --resume 20250101-120000-1a2b3c4d
     """
+    usage = (
+        'Usage: python nexus_pipeline.py "Create me a weather app in LangGraph"\n'
+        "       python nexus_pipeline.py --resume <run_id>"
+    )
     argv = argv if argv is not None else sys.argv[1:]
+    if argv and argv[0] in ("-h", "--help"):
+        print(usage)
+        return
+
     if not argv:
         print("No user query provided.")
-        print('Usage: python nexus_pipeline.py "Create me a weather app in LangGraph"')
+        print(usage)
         return
 
-    user_query = argv[0]
-    summary = run_pipeline(user_query)
+    if argv[0] == "--resume":
+        if len(argv) < 2:
+            print("No run ID provided.")
+            print(usage)
+            return
+        summary = resume(argv[1], context=get_default_context())
+    else:
+        user_query = argv[0]
+        summary = run_pipeline(user_query, context=get_default_context())
 
     print("\nFinal Pipeline Summary:")
     print(json.dumps(summary, indent=2))
@@ -0,0 +1,271 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Dict, Optional, Tuple, TypeVar, TYPE_CHECKING
+
+from dotenv import load_dotenv
+
+from rag_manager import RAGManager
+from llm_validator import LLMValidator
+from reader_agent import ReaderAgent
+from checkpoint_store import CheckpointStore
+from response_cache import TTLCache, PersistentTTLCache
+from retry_policy import RetryPolicy
+
+if TYPE_CHECKING:
+    import httpx
+    from prescreen import Band
+    from langchain_openai import AzureChatOpenAI
+
+T = TypeVar("T")
+
+
+def make_llm_client(http_client: "httpx.Client" = None, http_async_client: "httpx.AsyncClient" = None) -> "AzureChatOpenAI":
+    """
+    Initialize AzureChatOpenAI using environment variables.
+    Adjust this function if you switch to another LLM.
+    langchain_openai is imported here, not at module import, because it dominates startup time.
+    Pass httpx clients to share their connection pools; by default the SDK creates its own.
+    SDK retries are off: RetryPolicy owns retries, so one failure is not retried at both layers.
+    """
+    from langchain_openai import AzureChatOpenAI
+
+    load_dotenv()
+    return AzureChatOpenAI(
+        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        deployment_name=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+        api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+        temperature=0.7,
+        max_retries=0,
+        http_client=http_client,
+        http_async_client=http_async_client
+    )
+
+
+class PipelineContext:
+    """
+    Long-lived pipeline resources
+    -----------------------------
+    - One pooled keep-alive HTTP client (sync and async) per LLM endpoint
+    - One LLM client, validator and reader shared by every run
+    - One retry policy, whose retry budget every agent and run draws on
+    - One RAGManager (index, embeddings client and cache) per memory directory
+    - One checkpoint store for resumable runs
+    - A private event loop on a daemon thread: pooled async connections belong to
+      one loop, so every run awaits its LLM calls there
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 60.0,
+        timeout: float = 120.0,
+        checkpoint_dir: str = "./.nexus_runs",
+        plan_cache_ttl: Optional[float] = None,
+        plan_cache_size: int = 256,
+        verdict_cache_ttl: Optional[float] = None,
+        verdict_cache_path: str = "./.nexus_cache/verdicts.sqlite",
+        prescreen: bool = False,
+        prescreen_bands: Optional[Dict[str, "Band"]] = None
+    ):
+        """
+        Args:
+            max_connections: connection pool size per endpoint; keep it at or above the
+                number of concurrent LLM calls (runs x WriterAgent.max_concurrency).
+            max_keepalive_connections: idle connections kept open per endpoint.
+            keepalive_expiry: seconds an idle connection stays open.
+            timeout: per-request timeout in seconds.
+            checkpoint_dir: where per-run stage checkpoints are kept.
+            plan_cache_ttl: seconds a validated plan is reused for an identical prompt;
+                None (default) disables the plan cache.
+            plan_cache_size: most plans kept in the cache.
+            verdict_cache_ttl: seconds an LLM fidelity/safety verdict is reused for the same
+                response, instruction and model; None (default) disables the verdict cache.
+            verdict_cache_path: SQLite file backing the verdict cache across restarts.
+            prescreen: score responses locally first and send only uncertain ones to
+                the LLM judge (tiered validation).
+            prescreen_bands: pre-screen Band per stage, over prescreen.DEFAULT_BANDS.
+        """
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+
+        self._http: Dict[str, Tuple["httpx.Client", "httpx.AsyncClient"]] = {}
+        self._llm = None
+        self._validator = None
+        self._reader = None
+        self._rags: Dict[str, RAGManager] = {}
+        self.checkpoints = CheckpointStore(checkpoint_dir)
+        self.retry_policy = RetryPolicy()
+        self.plan_cache = TTLCache(ttl_s=plan_cache_ttl, max_entries=plan_cache_size) if plan_cache_ttl else None
+        self.verdict_cache = (
+            PersistentTTLCache(verdict_cache_path, ttl_s=verdict_cache_ttl) if verdict_cache_ttl else None
+        )
+        self.prescreen = None
+        if prescreen:
+            # Imported only when enabled: the pre-screen's embeddings are not part of the import budget.
+            from prescreen import LocalPrescreen
+            self.prescreen = LocalPrescreen(bands=prescreen_bands)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.RLock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The context's event loop, started on first use."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="nexus-pipeline-loop", daemon=True).start()
+            return self._loop
+
+    def on_loop(self) -> bool:
+        """True when called from a coroutine running on the context's loop."""
+        try:
+            return self._loop is not None and asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def submit(self, coro: Awaitable[T]) -> "Future[T]":
+        """Schedule a coroutine on the context's loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Run a coroutine on the context's loop and block until it finishes."""
+        if self.on_loop():
+            raise RuntimeError("PipelineContext.run() called from its own event loop; await the coroutine instead.")
+        return self.submit(coro).result()
+
+    async def arun(self, coro: Awaitable[T]) -> T:
+        """Await a coroutine on the context's loop from any other event loop."""
+        if self.on_loop():
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def http_clients(self, endpoint: str) -> Tuple["httpx.Client", "httpx.AsyncClient"]:
+        """Pooled keep-alive clients for one endpoint, created once."""
+        import httpx
+
+        with self._lock:
+            if endpoint not in self._http:
+                limits = httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry
+                )
+                self._http[endpoint] = (
+                    httpx.Client(limits=limits, timeout=self.timeout),
+                    httpx.AsyncClient(limits=limits, timeout=self.timeout)
+                )
+            return self._http[endpoint]
+
+    def llm(self) -> "AzureChatOpenAI":
+        """Shared AzureChatOpenAI client on the endpoint's pooled connections."""
+        with self._lock:
+            if self._llm is None:
+                load_dotenv()
+                http_client, http_async_client = self.http_clients(os.getenv("AZURE_OPENAI_ENDPOINT") or "")
+                self._llm = make_llm_client(http_client=http_client, http_async_client=http_async_client)
+            return self._llm
+
+    def validator(self) -> LLMValidator:
+        with self._lock:
+            if self._validator is None:
+                self._validator = LLMValidator(
+                    self.llm(), verdict_cache=self.verdict_cache, prescreen=self.prescreen
+                )
+            return self._validator
+
+    def reader(self) -> ReaderAgent:
+        with self._lock:
+            if self._reader is None:
+                self._reader = ReaderAgent(
+                    llm_client=self.llm(),
+                    validator=self.validator(),
+                    plan_cache=self.plan_cache,
+                    retry_policy=self.retry_policy
+                )
+            return self._reader
+
+    def rag(self, persist_dir: str = "./rag_memory") -> RAGManager:
+        """RAGManager for a memory directory, opened once and kept for later runs."""
+        key = os.path.abspath(persist_dir)
+        with self._lock:
+            if key not in self._rags:
+                self._rags[key] = RAGManager(persist_dir=persist_dir)
+            return self._rags[key]
+
+    def warm_up(self, rag_persist_dir: str = "./rag_memory") -> float:
+        """
+        Build the shared clients, open the memory index and connect to the LLM
+        endpoint (sync and async pools) so the first run skips connection setup.
+        Returns the seconds spent. Connection failures are reported, not raised.
+        """
+        started = time.perf_counter()
+        self.reader()
+        rag = self.rag(rag_persist_dir)
+        rag.embeddings
+        rag._ensure_loaded()
+
+        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+        if endpoint:
+            http_client, http_async_client = self.http_clients(endpoint)
+            try:
+                # Any response will do: the goal is a pooled TCP/TLS connection.
+                http_client.get(endpoint)
+                self.run(http_async_client.get(endpoint))
+            except Exception as e:
+                print(f"Warm-up could not reach the LLM endpoint: {e}")
+
+        elapsed = time.perf_counter() - started
+        print(f"Pipeline context warmed up in {elapsed:.2f}s.")
+        return elapsed
+
+    def close(self):
+        """Close pooled connections and stop the context's loop."""
+        with self._lock:
+            for http_client, http_async_client in self._http.values():
+                http_client.close()
+                if self._loop is not None:
+                    self.run(http_async_client.aclose())
+            self._http.clear()
+            for rag in self._rags.values():
+                rag.save()
+            self._rags.clear()
+            self._llm = self._validator = self._reader = None
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
+
+
+_default_context: Optional[PipelineContext] = None
+_default_lock = threading.Lock()
+
+
+def get_default_context() -> PipelineContext:
+    """
+    Process-wide context shared by the CLI, the Streamlit app and the MCP server.
+    Pool sizes come from NEXUS_HTTP_MAX_CONNECTIONS and NEXUS_HTTP_MAX_KEEPALIVE,
+    the checkpoint directory from NEXUS_CHECKPOINT_DIR. Set NEXUS_PLAN_CACHE_TTL
+    (seconds) to reuse plans for repeated prompts, NEXUS_VERDICT_CACHE_TTL (seconds)
+    to reuse validator verdicts, stored under NEXUS_VERDICT_CACHE_PATH, and
+    NEXUS_PRESCREEN=1 for tiered validation.
+    """
+    global _default_context
+    with _default_lock:
+        if _default_context is None:
+            load_dotenv()
+            _default_context = PipelineContext(
+                max_connections=int(os.getenv("NEXUS_HTTP_MAX_CONNECTIONS", "20")),
+                max_keepalive_connections=int(os.getenv("NEXUS_HTTP_MAX_KEEPALIVE", "10")),
+                checkpoint_dir=os.getenv("NEXUS_CHECKPOINT_DIR", "./.nexus_runs"),
+                plan_cache_ttl=float(os.getenv("NEXUS_PLAN_CACHE_TTL", "0")) or None,
+                verdict_cache_ttl=float(os.getenv("NEXUS_VERDICT_CACHE_TTL", "0")) or None,
+                verdict_cache_path=os.getenv("NEXUS_VERDICT_CACHE_PATH", "./.nexus_cache/verdicts.sqlite"),
+                prescreen=os.getenv("NEXUS_PRESCREEN", "0").lower() in ("1", "true", "yes")
+            )
+        return _default_context
@@ -0,0 +1,198 @@
+import re
+import math
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+# Local decisions.
+PASS = "pass"
+FAIL = "fail"
+ESCALATE = "escalate"
+
+FEATURES = ["similarity", "coverage", "substance", "format", "safety", "refusal"]
+
+# Hand-set starting point for the logistic scorer; fit() replaces them with
+# weights learned from labelled verdicts (e.g. past LLM judge results).
+DEFAULT_WEIGHTS = {
+    "bias": -5.5,
+    "similarity": 5.0,
+    "coverage": 4.0,
+    "substance": 1.0,
+    "format": 1.0,
+    "safety": 1.0,
+    "refusal": -6.0
+}
+
+_TOKEN = re.compile(r"\w+")
+_STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "from", "into", "your", "you", "are", "was",
+    "will", "can", "should", "would", "could", "about", "using", "use", "make", "create",
+    "build", "write", "please", "want", "need", "have", "has", "all", "any", "its", "our"
+}
+_REFUSAL = re.compile(
+    r"\b(?:i(?:'m| am) sorry|i can(?:not|'t) (?:help|assist|do)|as an ai\b|i(?:'m| am) unable to)",
+    re.IGNORECASE
+)
+
+
+class Band(NamedTuple):
+    """Scores below `fail_below` fail locally, above `pass_above` pass locally; the rest escalate."""
+    fail_below: float
+    pass_above: float
+
+
+# Per pipeline stage. Plans are JSON, so their wording overlaps less with the
+# user's query and more of them are left to the LLM judge.
+DEFAULT_BANDS = {
+    "default": Band(0.15, 0.90),
+    "prompt_validation": Band(0.15, 0.85),
+    "plan": Band(0.10, 0.95),
+    "plan_validation": Band(0.10, 0.95)
+}
+
+
+def _content_words(tokens: Sequence[str]) -> set:
+    return {t for t in tokens if len(t) > 2 and t not in _STOPWORDS and not t.isdigit()}
+
+
+def _sigmoid(x: float) -> float:
+    if x < -60:
+        return 0.0
+    return 1.0 / (1.0 + math.exp(-x))
+
+
+class LocalPrescreen:
+    """
+    Local pre-screen for LLMValidator
+    ---------------------------------
+    - Scores a response against its instruction without any network call:
+      embedding similarity (HashingEmbeddings), instruction keyword coverage,
+      structural heuristics (length, refusals) and the local report's format/safety scores
+    - A small logistic classifier turns the features into a pass probability
+    - Per-stage bands decide: pass or fail locally, or escalate to the LLM judge
+    - stats() counts decisions, i.e. how much LLM judge traffic was avoided
+    """
+
+    def __init__(
+        self,
+        embeddings=None,
+        weights: Optional[Dict[str, float]] = None,
+        bands: Optional[Dict[str, Band]] = None
+    ):
+        """
+        Args:
+            embeddings: LangChain Embeddings used for similarity; defaults to HashingEmbeddings.
+            weights: logistic weights per feature name plus "bias"; defaults to DEFAULT_WEIGHTS.
+            bands: Band per stage name, with a "default" entry; merged over DEFAULT_BANDS.
+        """
+        if embeddings is None:
+            # local_embeddings pulls in langchain_core; only pay for it once a pre-screen is built.
+            from local_embeddings import HashingEmbeddings
+            embeddings = HashingEmbeddings()
+        self.embeddings = embeddings
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.bands = {**DEFAULT_BANDS, **(bands or {})}
+        self.decisions = {PASS: 0, FAIL: 0, ESCALATE: 0}
+        self._lock = threading.Lock()
+
+    def features(self, response_text: str, instruction: str, report: Dict[str, Any]) -> Dict[str, float]:
+        """Feature vector in [0, 1] for one response; `report` is its local validation report."""
+        response_tokens = _TOKEN.findall(response_text.lower())
+        instruction_words = _content_words(_TOKEN.findall(instruction.lower()))
+
+        vectors = self.embeddings.embed_documents([instruction, response_text])
+        similarity = max(0.0, sum(a * b for a, b in zip(vectors[0], vectors[1])))
+        coverage = (
+            len(instruction_words & set(response_tokens)) / len(instruction_words) if instruction_words else 0.5
+        )
+        # Very short answers to long instructions are rarely complete.
+        substance = min(1.0, len(response_tokens) / max(8, 2 * len(instruction_words)))
+        refusal = 1.0 if _REFUSAL.search(response_text[:400]) else 0.0
+
+        return {
+            "similarity": similarity,
+            "coverage": coverage,
+            "substance": substance,
+            "format": max(0.0, report["scores"]["format"]),
+            "safety": report["scores"]["safety"],
+            "refusal": refusal
+        }
+
+    def score(self, features: Dict[str, float]) -> float:
+        """Probability that the LLM judge would accept the response."""
+        logit = self.weights.get("bias", 0.0)
+        for name in FEATURES:
+            logit += self.weights.get(name, 0.0) * features[name]
+        return _sigmoid(logit)
+
+    def band(self, stage: Optional[str]) -> Band:
+        return self.bands.get(stage or "default", self.bands["default"])
+
+    def decide(self, score: float, stage: Optional[str] = None) -> str:
+        band = self.band(stage)
+        if score < band.fail_below:
+            return FAIL
+        if score > band.pass_above:
+            return PASS
+        return ESCALATE
+
+    def screen(
+        self,
+        response_text: str,
+        instruction: str,
+        report: Dict[str, Any],
+        stage: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """{"score", "decision", "stage", "features"} for one response."""
+        features = self.features(response_text, instruction, report)
+        score = self.score(features)
+        decision = self.decide(score, stage)
+        with self._lock:
+            self.decisions[decision] += 1
+        return {
+            "score": round(score, 4),
+            "decision": decision,
+            "stage": stage or "default",
+            "features": {name: round(value, 4) for name, value in features.items()}
+        }
+
+    def fit(
+        self,
+        samples: List[Dict[str, float]],
+        labels: List[int],
+        epochs: int = 300,
+        learning_rate: float = 0.5,
+        l2: float = 0.01
+    ) -> Dict[str, float]:
+        """
+        Fit the logistic weights on labelled feature vectors (1 = accepted by the
+        LLM judge, 0 = rejected) with batch gradient descent; returns the new weights.
+        """
+        if not samples or len(samples) != len(labels):
+            raise ValueError("fit() needs at least one sample and one label per sample.")
+
+        weights = dict(self.weights)
+        n = len(samples)
+        for _ in range(epochs):
+            gradient = {name: 0.0 for name in ["bias"] + FEATURES}
+            for features, label in zip(samples, labels):
+                logit = weights.get("bias", 0.0) + sum(weights.get(f, 0.0) * features[f] for f in FEATURES)
+                error = _sigmoid(logit) - label
+                gradient["bias"] += error
+                for name in FEATURES:
+                    gradient[name] += error * features[name]
+            for name, total in gradient.items():
+                penalty = l2 * weights.get(name, 0.0) if name != "bias" else 0.0
+                weights[name] = weights.get(name, 0.0) - learning_rate * (total / n + penalty)
+
+        self.weights = weights
+        return dict(weights)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = sum(self.decisions.values())
+            return {
+                **self.decisions,
+                "screened": total,
+                "local_rate": (self.decisions[PASS] + self.decisions[FAIL]) / total if total else 0.0
+            }
+
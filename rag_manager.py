@@ -1,50 +1,644 @@
 import os
 import uuid
 import json
-from typing import List, Dict
+import time
+import pickle
+import asyncio
+import hashlib
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
+from typing import List, Dict, Iterable, Optional, Any, Tuple
 
 from dotenv import load_dotenv
-load_dotenv()
 
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import FAISS
+import numpy as np
+import faiss
 
-
-# Initialize Gemini embeddings
-embedding_model = GoogleGenerativeAIEmbeddings(
-    model="models/embedding-001",
-    google_api_key=os.getenv("GEMINI_API_KEY")
+from faiss_index import (
+    INDEX_TYPES, build_index, tune_index, is_flat, all_vectors, min_training_vectors, invlists_to_ram
 )
+from metadata_index import MetadataIndex, extract_metadata, to_epoch
+from lexical_index import BM25Index, reciprocal_rank_fusion
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, a persist_dir then serves one process
+    fcntl = None
+
+
+# langchain_google_genai and langchain_community take well over a second to import,
+# and anything built on langchain_core.embeddings pulls in all of langchain_core, so
+# these are imported on first use rather than at module import.
+
+@lru_cache(maxsize=1)
+def _gemini_embedding_model():
+    """Initialize Gemini embeddings on first use, so local backends never need an API key."""
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    return GoogleGenerativeAIEmbeddings(
+        model="models/embedding-001",
+        google_api_key=os.getenv("GEMINI_API_KEY")
+    )
+
+
+def __getattr__(name: str):
+    # Backwards compatible access to the module-level Gemini client.
+    if name == "embedding_model":
+        return _gemini_embedding_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _faiss_store():
+    """The LangChain FAISS vector store class."""
+    from langchain_community.vectorstores import FAISS
+
+    return FAISS
+
+# Selectable with RAGManager(embedding_backend=...) or NEXUS_EMBEDDING_BACKEND.
+EMBEDDING_BACKENDS = ("gemini", "sentence-transformers", "hashing")
+
+
+def make_embedding_model(backend: Optional[str] = None):
+    """Return the embeddings client for a backend name (default: NEXUS_EMBEDDING_BACKEND or gemini)."""
+    load_dotenv()
+    backend = (backend or os.getenv("NEXUS_EMBEDDING_BACKEND") or "gemini").lower()
+    if backend == "gemini":
+        return _gemini_embedding_model()
+    if backend == "sentence-transformers":
+        from local_embeddings import SentenceTransformerEmbeddings
+        return SentenceTransformerEmbeddings()
+    if backend == "hashing":
+        from local_embeddings import HashingEmbeddings
+        return HashingEmbeddings()
+    raise ValueError(f"Unknown embedding backend '{backend}'. Expected one of {EMBEDDING_BACKENDS}.")
+
+# On-disk layout inside persist_dir. The index/docstore pair uses the same
+# format as FAISS.save_local, so a snapshot can also be opened with load_local.
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "index.pkl"
+# Metadata postings, BM25 postings and text size of the snapshot, so a load does
+# not rebuild them from the docstore.
+INDEXES_FILE = "indexes.pkl"
+INDEXES_VERSION = 1
+JOURNAL_FILE = "journal.jsonl"
+META_FILE = "meta.json"
+LOCK_FILE = ".lock"
+
+
+def _mmap_flags(index_path: str) -> int:
+    """faiss read flags for a read-only, memory-mapped load of the given snapshot."""
+    with open(index_path, "rb") as f:
+        fourcc = f.read(4)
+    # IVF indexes ("Iw..") map their inverted lists; flat code arrays (Flat, HNSW
+    # storage) need IO_FLAG_MMAP_IFC on faiss releases that provide it. The two
+    # cannot be combined in one read.
+    if fourcc.startswith(b"Iw"):
+        flags = faiss.IO_FLAG_MMAP
+    else:
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    return flags | faiss.IO_FLAG_READ_ONLY
 
 
 class RAGManager:
     """Corrective RAG with Gemini Embeddings + FAISS"""
 
-    def __init__(self, persist_dir: str = "./rag_memory"):
+    def __init__(
+        self,
+        persist_dir: str = "./rag_memory",
+        mmap: bool = True,
+        snapshot_every: int = 256,
+        embedding_cache: bool = True,
+        embedding_backend: Optional[str] = None,
+        embeddings=None,
+        index_type: str = "flat",
+        migrate_threshold: int = 50_000,
+        nprobe: int = 16,
+        ef_search: int = 64,
+        exact_filter_limit: int = 1024,
+        dedupe_similarity: Optional[float] = 0.98,
+        hybrid: bool = True,
+        rrf_k: int = 60
+    ):
+        """
+        Args:
+            persist_dir: directory holding the FAISS snapshot and the insight journal.
+            mmap: load the snapshot memory-mapped so processes share the same pages.
+            snapshot_every: journaled inserts after which a full snapshot is written.
+            embedding_cache: serve repeated texts from a disk-backed embedding cache.
+            embedding_backend: "gemini", "sentence-transformers" (local all-MiniLM-L6-v2)
+                or "hashing" (deterministic, for tests). A persisted memory can only be
+                reopened with the backend that built it.
+            embeddings: an already built (and possibly cached) embeddings client to use
+                instead of embedding_backend/embedding_cache, e.g. one shared by shards.
+            index_type: target index ("flat", "ivf_flat", "hnsw" or "ivf_pq"). Memory
+                starts as an exact flat index and migrates to this type once it holds
+                `migrate_threshold` insights.
+            nprobe: inverted lists probed per query for IVF indexes.
+            ef_search: candidate list size per query for HNSW indexes.
+            exact_filter_limit: filtered searches with at most this many candidates
+                are scored exactly instead of going through the ANN index.
+            dedupe_similarity: cosine similarity at or above which a new insight is
+                treated as a near-duplicate of a stored one and skipped. None keeps
+                only exact (content hash) dedupe.
+            hybrid: fuse BM25 lexical ranking with the vector ranking (reciprocal rank
+                fusion) in fetch_context, so exact identifiers and error strings match.
+            rrf_k: reciprocal rank fusion constant.
+        """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}'. Expected one of {INDEX_TYPES}.")
+
         self.persist_dir = persist_dir
-        self.embeddings = embedding_model
-        self.db = None  # FAISS starts empty
+        self.embedding_backend = embedding_backend
+        self.embedding_cache = embedding_cache
+        self._embeddings = embeddings
+        self._embedding_model_name = None
+        if embeddings is not None:
+            self._embedding_model_name = (
+                getattr(embeddings, "model_name", None) or getattr(embeddings, "model", None) or type(embeddings).__name__
+            )
+        self.mmap = mmap
+        self.snapshot_every = snapshot_every
+        self.index_type = index_type
+        self.migrate_threshold = migrate_threshold
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.exact_filter_limit = exact_filter_limit
+        self.dedupe_similarity = dedupe_similarity
+        self.hybrid = hybrid
+        self.rrf_k = rrf_k
+        self.metadata_index = MetadataIndex()
+        self.lexical_index = BM25Index()
+        self.db = None  # FAISS starts empty unless a snapshot exists
+        self._mmapped = False
+        self._journal_entries = 0
+        # Stored text size, kept up to date on insert so memory_bytes() never walks the docstore.
+        self._text_bytes = 0
+        # The snapshot is opened on first use, keeping construction free of disk and network work.
+        self._loaded = False
+        # Concurrent first searches (afetch_context runs on worker threads) must load only once.
+        # Reentrant: replaying the journal can migrate the index, and migrate_index/save
+        # call back into _ensure_loaded on the loading thread.
+        self._load_lock = threading.RLock()
+        self._loading = False
+        # Journal appends and snapshots are serialized across processes sharing persist_dir.
+        self._persist_lock = threading.RLock()
+        self._persist_depth = 0
+        self._lock_file = None
+        self._snapshot_mtime = None
+
+    @property
+    def embeddings(self):
+        """Embeddings client, built on first access."""
+        if self._embeddings is None:
+            base_embeddings = make_embedding_model(self.embedding_backend)
+            self._embedding_model_name = getattr(base_embeddings, "model", None) or type(base_embeddings).__name__
+            self._embeddings = base_embeddings
+            if self.embedding_cache:
+                from embedding_cache import CachedEmbeddings
+
+                self._embeddings = CachedEmbeddings(
+                    base_embeddings,
+                    cache_dir=os.path.join(self.persist_dir, "embedding_cache"),
+                    model_name=self._embedding_model_name
+                )
+        return self._embeddings
+
+    @property
+    def embedding_model_name(self) -> str:
+        """Name of the model behind `embeddings`; recorded in meta.json."""
+        if self._embeddings is None:
+            self.embeddings
+        return self._embedding_model_name
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._load_lock:
+                # _loading: a call from inside the load itself, which must not load again.
+                if not self._loaded and not self._loading:
+                    self._loading = True
+                    try:
+                        self._load_index()
+                        self._loaded = True
+                    finally:
+                        self._loading = False
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.persist_dir, name)
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock on persist_dir, shared with other processes (fcntl); reentrant."""
+        with self._persist_lock:
+            if self._persist_depth == 0 and fcntl is not None:
+                os.makedirs(self.persist_dir, exist_ok=True)
+                self._lock_file = open(self._path(LOCK_FILE), "a")
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            self._persist_depth += 1
+            try:
+                yield
+            finally:
+                self._persist_depth -= 1
+                if self._persist_depth == 0 and self._lock_file is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def _index_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self._path(INDEX_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load_index(self):
+        """Open the persisted snapshot (memory-mapped) and replay the journal on top."""
+        if not os.path.isdir(self.persist_dir):
+            return
+        # Held while reading, so another process cannot snapshot and drop the journal in between.
+        with self._locked():
+            self._load_snapshot()
+            self._replay_journal()
+
+    def _load_snapshot(self):
+        index_path = self._path(INDEX_FILE)
+        store_path = self._path(DOCSTORE_FILE)
+
+        meta_path = self._path(META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                stored_model = json.load(f).get("embedding_model")
+            if stored_model and stored_model != self.embedding_model_name:
+                raise ValueError(
+                    f"Memory in {self.persist_dir} was built with embeddings '{stored_model}', "
+                    f"not '{self.embedding_model_name}'. Use that backend or another persist_dir."
+                )
+
+        if os.path.exists(index_path) and os.path.exists(store_path):
+            try:
+                index = None
+                if self.mmap:
+                    try:
+                        index = faiss.read_index(index_path, _mmap_flags(index_path))
+                        self._mmapped = True
+                    except Exception as e:
+                        print(f"Memory-mapped load failed ({e}), reading index into RAM.")
+                if index is None:
+                    index = faiss.read_index(index_path)
+                with open(store_path, "rb") as f:
+                    docstore, index_to_docstore_id = pickle.load(f)
+
+                self.db = _faiss_store()(
+                    embedding_function=self.embeddings,
+                    index=index,
+                    docstore=docstore,
+                    index_to_docstore_id=index_to_docstore_id
+                )
+                tune_index(index, nprobe=self.nprobe, ef_search=self.ef_search)
+                if not self._load_indexes(index_to_docstore_id):
+                    # Snapshots written before indexes.pkl existed, or out of step with it.
+                    self.metadata_index = MetadataIndex.from_store(self.db)
+                    self.lexical_index = BM25Index.from_store(self.db)
+                    self._text_bytes = sum(
+                        len(getattr(docstore.search(doc_id), "page_content", ""))
+                        for doc_id in index_to_docstore_id.values()
+                    )
+                self._snapshot_mtime = self._index_mtime()
+                print(f"Loaded {index.ntotal} insights from {self.persist_dir}")
+            except Exception as e:
+                # Keep the unreadable snapshot for inspection instead of overwriting it on the next save.
+                print(f"Error loading persisted memory: {e}")
+                for path in (index_path, store_path):
+                    os.replace(path, path + ".corrupt")
+                self.db = None
+                self._mmapped = False
+                self._text_bytes = 0
 
-    def _ensure_index(self):
-        """Ensure FAISS index exists."""
+    @staticmethod
+    def _snapshot_tag(index_to_docstore_id: Dict[int, str]) -> Tuple[int, Optional[str]]:
+        """Identifies the snapshot a set of derived indexes was built from."""
+        return len(index_to_docstore_id), index_to_docstore_id.get(len(index_to_docstore_id) - 1)
+
+    def _load_indexes(self, index_to_docstore_id: Dict[int, str]) -> bool:
+        """Restore the persisted metadata/BM25 indexes if they belong to this snapshot."""
+        path = self._path(INDEXES_FILE)
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, "rb") as f:
+                indexes = pickle.load(f)
+        except Exception as e:
+            print(f"Rebuilding search indexes ({e}).")
+            return False
+        if indexes.get("version") != INDEXES_VERSION or indexes.get("snapshot") != self._snapshot_tag(index_to_docstore_id):
+            return False
+        self.metadata_index = indexes["metadata"]
+        self.lexical_index = indexes["lexical"]
+        self._text_bytes = indexes["text_bytes"]
+        return True
+
+    def _read_journal(self) -> List[Dict]:
+        journal_path = self._path(JOURNAL_FILE)
+        if not os.path.exists(journal_path):
+            return []
+
+        entries = []
+        with open(journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # A torn final line from a crash mid-append; everything before it is intact.
+                    break
+        return entries
+
+    def _insert_unknown(self, entries: List[Dict], migrate: bool = True) -> int:
+        """Insert journal-format entries whose ids this index does not hold yet."""
+        known = set(self.db.index_to_docstore_id.values()) if self.db is not None else set()
+        pending = [e for e in entries if e["id"] not in known]
+        if pending:
+            self._insert_embeddings(
+                texts=[e["text"] for e in pending],
+                vectors=[e["vector"] for e in pending],
+                metadatas=[e["metadata"] for e in pending],
+                ids=[e["id"] for e in pending],
+                migrate=migrate
+            )
+        return len(pending)
+
+    def _replay_journal(self):
+        """Apply inserts that were journaled after the last snapshot."""
+        entries = self._read_journal()
+        self._journal_entries = len(entries)
+        replayed = self._insert_unknown(entries)
+        if replayed:
+            print(f"Replayed {replayed} journaled insights.")
+
+    def _merge_from_disk(self):
+        """
+        Fold in insights other processes persisted since this one loaded: their journal
+        entries and, if the snapshot was replaced, the snapshot's insights. Called under
+        the persist_dir lock right before a snapshot overwrites both.
+        """
+        entries = []
+        if self._index_mtime() != self._snapshot_mtime and os.path.exists(self._path(DOCSTORE_FILE)):
+            try:
+                index = faiss.read_index(self._path(INDEX_FILE))
+                with open(self._path(DOCSTORE_FILE), "rb") as f:
+                    docstore, index_to_docstore_id = pickle.load(f)
+                known = set(self.db.index_to_docstore_id.values())
+                positions = [p for p, doc_id in index_to_docstore_id.items() if doc_id not in known]
+                if positions:
+                    vectors = all_vectors(index)[positions]
+                    for position, vector in zip(positions, vectors):
+                        doc = docstore.search(index_to_docstore_id[position])
+                        entries.append({
+                            "id": index_to_docstore_id[position],
+                            "text": doc.page_content,
+                            "metadata": doc.metadata,
+                            "vector": vector.tolist()
+                        })
+            except Exception as e:
+                print(f"Could not merge the snapshot on disk ({e}); keeping this process's copy.")
+        entries.extend(self._read_journal())
+
+        merged = self._insert_unknown(entries, migrate=False)
+        if merged:
+            print(f"Merged {merged} insights persisted by other processes.")
+
+    def _ensure_writable(self):
+        """
+        A memory-mapped index is read-only; bring it into RAM before the first write.
+        The copy must match this process's index_to_docstore_id, so the snapshot is
+        only re-read while it is still the file this process mapped.
+        """
+        if self.db is None or not self._mmapped:
+            return
+
+        if faiss.try_extract_index_ivf(self.db.index) is None:
+            # Flat/HNSW: an in-memory copy of the mapped index (faiss.clone_index would
+            # keep viewing the mapped code array).
+            self.db.index = faiss.deserialize_index(faiss.serialize_index(self.db.index))
+        else:
+            # IVF maps its inverted lists (OnDiskInvertedLists), which cannot be serialized.
+            with self._locked():
+                if self._index_mtime() == self._snapshot_mtime:
+                    self.db.index = faiss.read_index(self._path(INDEX_FILE))
+                else:
+                    invlists_to_ram(self.db.index)
+        tune_index(self.db.index, nprobe=self.nprobe, ef_search=self.ef_search)
+        self._mmapped = False
+
+    def _maybe_migrate(self):
+        """
+        Switch from the exact flat scan to the configured approximate index past the
+        threshold, once there are also enough vectors to train it (a low threshold
+        otherwise has ivf_pq training starved k-means on every insert).
+        """
+        if (
+            self.index_type != "flat"
+            and self.db is not None
+            and self.db.index.ntotal >= max(self.migrate_threshold, min_training_vectors(self.index_type))
+            and is_flat(self.db.index)
+        ):
+            self.migrate_index(self.index_type)
+
+    def migrate_index(self, index_type: str, **params):
+        """
+        Rebuild the index as `index_type`, training it on every stored vector.
+        Extra params (nlist, hnsw_m, pq_m, pq_nbits) are passed to the index factory.
+        """
+        self._ensure_loaded()
         if self.db is None:
-            self.db = FAISS.from_texts(
-                texts=[],
+            return
+        self._ensure_writable()
+
+        started = time.perf_counter()
+        vectors = all_vectors(self.db.index)
+        self.db.index = build_index(
+            index_type, vectors, nprobe=self.nprobe, ef_search=self.ef_search, **params
+        )
+        print(f"Migrated {len(vectors)} insights to a {index_type} index in {time.perf_counter() - started:.1f}s")
+        self.save()
+
+    def _insert_embeddings(
+        self,
+        texts: List[str],
+        vectors: List[List[float]],
+        metadatas: List[Dict],
+        ids: List[str],
+        migrate: bool = True
+    ):
+        """Insert precomputed embeddings, creating the index on first use."""
+        self._text_bytes += sum(len(text) for text in texts)
+        if self.db is None:
+            self.db = _faiss_store().from_embeddings(
+                text_embeddings=list(zip(texts, vectors)),
                 embedding=self.embeddings,
-                metadatas=[]
+                metadatas=metadatas,
+                ids=ids
             )
+            self.metadata_index.add_many(0, metadatas)
+            self.lexical_index.add_many(0, texts)
+            return
 
-    def add_corrective_insight(self, insight_package: Dict):
-        try:
-            self._ensure_index()
+        self._ensure_writable()
+        start = self.db.index.ntotal
+        self.db.add_embeddings(
+            text_embeddings=list(zip(texts, vectors)),
+            metadatas=metadatas,
+            ids=ids
+        )
+        self.metadata_index.add_many(start, metadatas)
+        self.lexical_index.add_many(start, texts)
+        if migrate:
+            self._maybe_migrate()
 
-            paragraph = json.dumps(insight_package, indent=2)
+    def _append_journal(self, texts: List[str], vectors: List[List[float]], metadatas: List[Dict], ids: List[str]):
+        """Durably record new inserts; a full snapshot is only written every `snapshot_every` entries."""
+        os.makedirs(self.persist_dir, exist_ok=True)
+        if not os.path.exists(self._path(META_FILE)):
+            with open(self._path(META_FILE), "w", encoding="utf-8") as f:
+                json.dump({"embedding_model": self.embedding_model_name}, f)
+        with self._locked(), open(self._path(JOURNAL_FILE), "a", encoding="utf-8") as f:
+            for text, vector, metadata, doc_id in zip(texts, vectors, metadatas, ids):
+                f.write(json.dumps({"id": doc_id, "text": text, "metadata": metadata, "vector": list(vector)}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
 
-            self.db.add_texts(
-                texts=[paragraph],
-                metadatas=[{"session_id": insight_package.get("session_id")}],
-                ids=[str(uuid.uuid4())]
-            )
+        self._journal_entries += len(ids)
+        if self._journal_entries >= self.snapshot_every:
+            self.save()
+
+    def save(self):
+        """
+        Write a full snapshot atomically and truncate the journal. Runs under the
+        persist_dir lock and first merges what other processes persisted, so their
+        journaled inserts are never dropped.
+        """
+        self._ensure_loaded()
+        if self.db is None:
+            return
+
+        os.makedirs(self.persist_dir, exist_ok=True)
+        with self._locked():
+            self._merge_from_disk()
+
+            index_tmp = self._path(INDEX_FILE + ".tmp")
+            store_tmp = self._path(DOCSTORE_FILE + ".tmp")
+
+            indexes_tmp = self._path(INDEXES_FILE + ".tmp")
+
+            faiss.write_index(self.db.index, index_tmp)
+            with open(store_tmp, "wb") as f:
+                pickle.dump((self.db.docstore, self.db.index_to_docstore_id), f)
+            with open(indexes_tmp, "wb") as f:
+                pickle.dump({
+                    "version": INDEXES_VERSION,
+                    "snapshot": self._snapshot_tag(self.db.index_to_docstore_id),
+                    "metadata": self.metadata_index,
+                    "lexical": self.lexical_index,
+                    "text_bytes": self._text_bytes
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            # os.replace keeps readers that already mapped the old file valid. A crash
+            # between the renames leaves indexes.pkl out of step; the load then rebuilds it.
+            os.replace(indexes_tmp, self._path(INDEXES_FILE))
+            os.replace(store_tmp, self._path(DOCSTORE_FILE))
+            os.replace(index_tmp, self._path(INDEX_FILE))
+
+            journal_path = self._path(JOURNAL_FILE)
+            if os.path.exists(journal_path):
+                os.remove(journal_path)
+            self._journal_entries = 0
+            self._snapshot_mtime = self._index_mtime()
+
+    def _prepare_insight(self, insight_package: Dict):
+        """Serialize one insight package into (text, metadata, id)."""
+        paragraph = json.dumps(insight_package, indent=2)
+        metadata = extract_metadata(insight_package)
+        metadata["content_hash"] = hashlib.sha256(
+            json.dumps(insight_package, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        return paragraph, metadata, str(uuid.uuid4())
+
+    def _near_duplicates(self, vectors: List[List[float]]) -> List[Optional[str]]:
+        """
+        For each vector, the docstore id (or "batch") of an insight it nearly duplicates,
+        judged by cosine similarity against its nearest stored neighbour and against
+        earlier vectors of the same batch.
+        """
+        if self.dedupe_similarity is None or not vectors:
+            return [None] * len(vectors)
+
+        x = np.asarray(vectors, dtype="float32")
+        xn = x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+        duplicates: List[Optional[str]] = [None] * len(vectors)
+
+        if self.db is not None and self.db.index.ntotal:
+            _, positions = self.db.index.search(x, 1)
+            for i, pos in enumerate(positions[:, 0]):
+                if pos == -1:
+                    continue
+                neighbour = self.db.index.reconstruct(int(pos))
+                neighbour = neighbour / max(float(np.linalg.norm(neighbour)), 1e-12)
+                if float(xn[i] @ neighbour) >= self.dedupe_similarity:
+                    duplicates[i] = self.db.index_to_docstore_id[int(pos)]
+
+        sims = xn @ xn.T
+        for i in range(1, len(vectors)):
+            if duplicates[i] is None and any(
+                duplicates[j] is None and sims[i, j] >= self.dedupe_similarity for j in range(i)
+            ):
+                duplicates[i] = "batch"
+        return duplicates
+
+    def _ingest(self, insight_packages: List[Dict]) -> Dict[str, int]:
+        """Dedupe, embed (one call), insert and journal a batch of insight packages."""
+        self._ensure_loaded()
+        prepared = []
+        duplicates = 0
+        seen = set()
+        for pkg in insight_packages:
+            text, metadata, doc_id = self._prepare_insight(pkg)
+            content_hash = metadata["content_hash"]
+            # Exact duplicates are dropped before paying for an embedding.
+            if content_hash in self.metadata_index.content_hashes or content_hash in seen:
+                duplicates += 1
+                continue
+            seen.add(content_hash)
+            prepared.append((text, metadata, doc_id))
+
+        if not prepared:
+            return {"stored": 0, "duplicates": duplicates}
+
+        vectors = self.embeddings.embed_documents([p[0] for p in prepared])
+        kept = [
+            (p, v) for p, v, dup in zip(prepared, vectors, self._near_duplicates(vectors))
+            if dup is None
+        ]
+        duplicates += len(prepared) - len(kept)
+        if not kept:
+            return {"stored": 0, "duplicates": duplicates}
+
+        texts = [p[0] for p, _ in kept]
+        metadatas = [p[1] for p, _ in kept]
+        ids = [p[2] for p, _ in kept]
+        vectors = [v for _, v in kept]
+
+        self._insert_embeddings(texts, vectors, metadatas, ids)
+        self._append_journal(texts, vectors, metadatas, ids)
+        return {"stored": len(kept), "duplicates": duplicates}
+
+    def add_corrective_insight(self, insight_package: Dict):
+        try:
+            result = self._ingest([insight_package])
+            if not result["stored"]:
+                print(f"Duplicate insight skipped for session: {insight_package.get('session_id')}")
+                return {"status": "duplicate", "session_id": insight_package.get("session_id")}
 
             print(f"Insight stored for session: {insight_package.get('session_id')}")
             return {"status": "stored", "session_id": insight_package.get("session_id")}
@@ -52,22 +646,339 @@ class RAGManager:
             print(f"Error storing insight: {e}")
             return {"status": "failed", "error": str(e)}
 
-    def fetch_context(self, query: str, k: int = 3) -> List[Dict]:
-        try:
-            self._ensure_index()
-            results = self.db.similarity_search_with_score(query, k=k)
+    def add_corrective_insights(
+        self,
+        insight_packages: Iterable[Dict],
+        chunk_size: int = 64,
+        resume_from: int = 0,
+        max_chunk_retries: int = 2
+    ) -> Dict:
+        """
+        Bulk-ingest insight packages.
+
+        Packages are consumed lazily in chunks of `chunk_size`; each chunk costs one
+        `embed_documents` call and one `add_embeddings` call. If a chunk keeps failing,
+        ingestion stops and `next_offset` tells the caller where to resume
+        (pass it back as `resume_from` with the same iterable).
+        """
+        stream = iter(insight_packages)
+        offset = resume_from
+        stored = 0
+        duplicates = 0
+        started = time.perf_counter()
+
+        # Skip what a previous, partially failed run already stored.
+        for _ in islice(stream, resume_from):
+            pass
+
+        def summary(status: str, error: Optional[str] = None) -> Dict:
+            elapsed = time.perf_counter() - started
+            return {
+                "status": status,
+                "stored": stored,
+                "duplicates": duplicates,
+                "next_offset": offset,
+                "elapsed_s": round(elapsed, 3),
+                "throughput": round((stored + duplicates) / elapsed, 2) if elapsed > 0 else 0.0,
+                "error": error
+            }
+
+        while True:
+            chunk = list(islice(stream, chunk_size))
+            if not chunk:
+                break
 
+            attempt = 0
+            while True:
+                try:
+                    result = self._ingest(chunk)
+                    break
+                except Exception as e:
+                    attempt += 1
+                    if attempt > max_chunk_retries:
+                        print(f"Bulk ingestion stopped at offset {offset}: {e}")
+                        return summary("partial", str(e))
+                    print(f"Chunk at offset {offset} failed ({e}), retrying...")
+
+            offset += len(chunk)
+            stored += result["stored"]
+            duplicates += result["duplicates"]
+            elapsed = time.perf_counter() - started
+            print(f"Processed {offset - resume_from} insights, {stored} stored ({(offset - resume_from) / elapsed:.1f}/s)")
+
+        return summary("stored")
+
+    def _search_params(self, selector):
+        """SearchParameters carrying an ID selector plus the per-type search knobs."""
+        if faiss.try_extract_index_ivf(self.db.index) is not None:
+            return faiss.SearchParametersIVF(sel=selector, nprobe=self.nprobe)
+        if isinstance(faiss.downcast_index(self.db.index), faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=self.ef_search)
+        return faiss.SearchParameters(sel=selector)
+
+    def _vector_search(self, query_vector: List[float], k: int, candidates: Optional[np.ndarray] = None):
+        """Return [(position, L2 distance)] for the k nearest vectors, optionally restricted to candidates."""
+        x = np.asarray([query_vector], dtype="float32")
+
+        if candidates is None:
+            distances, positions = self.db.index.search(x, k)
+        elif len(candidates) <= self.exact_filter_limit:
+            # Few candidates: an exact scan over just those vectors beats any index probe.
+            vectors = self.db.index.reconstruct_batch(candidates)
+            scores = ((vectors - x) ** 2).sum(axis=1)
+            order = np.argsort(scores)[:k]
+            return [(int(candidates[i]), float(scores[i])) for i in order]
+        else:
+            selector = faiss.IDSelectorBatch(candidates)
+            distances, positions = self.db.index.search(
+                x, min(k, len(candidates)), params=self._search_params(selector)
+            )
+
+        return [
+            (int(pos), float(dist))
+            for pos, dist in zip(positions[0], distances[0])
+            if pos != -1
+        ]
+
+    def _result(self, position: int, score: float) -> Dict[str, Any]:
+        doc = self.db.docstore.search(self.db.index_to_docstore_id[position])
+        return {"text": doc.page_content, "similarity": score, "metadata": doc.metadata}
+
+    @staticmethod
+    def _fusion_depth(k: int) -> int:
+        """How deep each ranking is read before fusing k results."""
+        return max(k * 4, 20)
+
+    def _distance(self, position: int, x: np.ndarray) -> float:
+        """L2 distance to a stored vector, for hits that only the lexical ranking found."""
+        return float(((self.db.index.reconstruct(position) - x) ** 2).sum())
+
+    def _hybrid_search(
+        self,
+        query: str,
+        query_vector: List[float],
+        k: int,
+        candidates: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float, float]]:
+        """Fuse vector and BM25 rankings; returns [(position, L2 distance, rrf score)]."""
+        depth = self._fusion_depth(k)
+        vector_hits = self._vector_search(query_vector, depth, candidates)
+        lexical_hits = self.lexical_index.search(query, depth, candidates)
+
+        distances = dict(vector_hits)
+        fused = reciprocal_rank_fusion(
+            [[p for p, _ in vector_hits], [p for p, _ in lexical_hits]], k=self.rrf_k
+        )[:k]
+
+        results = []
+        x = np.asarray(query_vector, dtype="float32")
+        for position, rrf_score in fused:
+            distance = distances.get(position)
+            if distance is None:
+                # Lexical-only hit: score it on the same L2 scale as the vector hits.
+                distance = self._distance(position, x)
+            results.append((position, distance, rrf_score))
+        return results
+
+    def search_rankings(
+        self,
+        query_vector: List[float],
+        k: int = 3,
+        filters: Optional[Dict[str, Any]] = None,
+        query: Optional[str] = None
+    ) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Tuple[int, Dict[str, Any]]]]:
+        """
+        The unfused rankings behind search_by_vector, for callers that merge several
+        managers before fusing (ShardedRAGManager): vector hits by L2 distance and,
+        when hybrid and given the query text, lexical hits by BM25 score. Both are
+        [(position, result)] and deep enough to fuse k results; lexical results carry
+        "bm25_score" next to their L2 distance.
+        """
+        self._ensure_loaded()
+        if self.db is None:
+            return [], []
+
+        candidates = self.metadata_index.candidates(filters) if filters else None
+        if candidates is not None and len(candidates) == 0:
+            return [], []
+
+        if not (query and self.hybrid):
+            return [(p, self._result(p, d)) for p, d in self._vector_search(query_vector, k, candidates)], []
+
+        depth = self._fusion_depth(k)
+        vector_hits = self._vector_search(query_vector, depth, candidates)
+        distances = dict(vector_hits)
+        x = np.asarray(query_vector, dtype="float32")
+        lexical = []
+        for position, bm25_score in self.lexical_index.search(query, depth, candidates):
+            distance = distances.get(position)
+            if distance is None:
+                distance = self._distance(position, x)
+            lexical.append((position, {**self._result(position, distance), "bm25_score": bm25_score}))
+        return [(p, self._result(p, d)) for p, d in vector_hits], lexical
+
+    def search_by_vector(
+        self,
+        query_vector: List[float],
+        k: int = 3,
+        filters: Optional[Dict[str, Any]] = None,
+        query: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        k closest insights to an already embedded query (see fetch_context for filters).
+        Passing the query text as well enables hybrid lexical + vector ranking.
+        """
+        self._ensure_loaded()
+        if self.db is None:
+            return []
+
+        candidates = self.metadata_index.candidates(filters) if filters else None
+        if candidates is not None and len(candidates) == 0:
+            return []
+
+        if query and self.hybrid:
             return [
-                {"text": doc.page_content, "similarity": score}
-                for doc, score in results
+                {**self._result(position, distance), "rrf_score": rrf_score}
+                for position, distance, rrf_score in self._hybrid_search(query, query_vector, k, candidates)
             ]
+
+        return [
+            self._result(position, score)
+            for position, score in self._vector_search(query_vector, k, candidates)
+        ]
+
+    def fetch_context(self, query: str, k: int = 3, filters: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """
+        Retrieve the k closest insights.
+
+        filters restricts the search by metadata, e.g.
+        {"framework": "langgraph", "tags": ["weather", "api"]}. Fields are AND-ed and
+        a list of values for one field is OR-ed.
+        """
+        try:
+            self._ensure_loaded()
+            if self.db is None:
+                return []
+            return self.search_by_vector(self.embeddings.embed_query(query), k=k, filters=filters, query=query)
         except Exception as e:
             print(f"Error fetching context: {e}")
             return []
 
+    async def afetch_context(self, query: str, k: int = 3, **kwargs) -> List[Dict]:
+        """fetch_context on a worker thread, so embedding and search do not block the event loop."""
+        return await asyncio.to_thread(self.fetch_context, query, k, **kwargs)
+
+    def memory_bytes(self) -> int:
+        """Rough resident size: vectors held in RAM (mapped pages are shared, not counted) plus stored text."""
+        if self.db is None:
+            return 0
+        index = self.db.index
+        vector_bytes = 0 if self._mmapped else index.ntotal * index.d * 4
+        return vector_bytes + self._text_bytes
+
+    @property
+    def dirty(self) -> bool:
+        """Whether inserts were journaled since the last snapshot."""
+        return self._journal_entries > 0
+
+    def compact(self, similarity: Optional[float] = None) -> Dict[str, int]:
+        """
+        Offline compaction: merge clusters of near-duplicate insights and rebuild the index.
+
+        Each cluster keeps its most recent insight; the others' session ids, tags and
+        content hashes are folded into its metadata so filters and exact dedupe keep
+        matching them.
+        """
+        threshold = similarity or self.dedupe_similarity or 0.98
+        self._ensure_loaded()
+        if self.db is None or self.db.index.ntotal == 0:
+            return {"before": 0, "after": 0, "merged": 0}
+
+        # Other processes wait until the compacted snapshot is written. Saving first folds
+        # in what they persisted and empties the journal, so no merged-away insight is
+        # brought back from it afterwards.
+        with self._locked():
+            self.save()
+            return self._compact(threshold)
+
+    def _compact(self, threshold: float) -> Dict[str, int]:
+        self._ensure_writable()
+        started = time.perf_counter()
+        vectors = all_vectors(self.db.index)
+        n = len(vectors)
+        docs = [self.db.docstore.search(self.db.index_to_docstore_id[i]) for i in range(n)]
+
+        # Union-find over all pairs whose cosine similarity clears the threshold.
+        xn = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        ip_index = faiss.IndexFlatIP(xn.shape[1])
+        ip_index.add(xn)
+        lims, _, neighbours = ip_index.range_search(xn, threshold)
+
+        parent = list(range(n))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i in range(n):
+            for j in neighbours[lims[i]:lims[i + 1]]:
+                a, b = find(i), find(int(j))
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+
+        clusters: Dict[int, List[int]] = {}
+        for i in range(n):
+            clusters.setdefault(find(i), []).append(i)
+
+        def values(i: int, field: str) -> list:
+            value = docs[i].metadata.get(field)
+            return value if isinstance(value, list) else [value]
+
+        texts, kept_vectors, metadatas, ids = [], [], [], []
+        for members in clusters.values():
+            # Parsed, since memories written before timestamps were normalized mix ISO strings and floats.
+            keep = max(members, key=lambda i: to_epoch(docs[i].metadata.get("timestamp")) or 0.0)
+            metadata = dict(docs[keep].metadata)
+            if len(members) > 1:
+                sessions = sorted({s for i in members for s in values(i, "session_id") if s})
+                metadata["session_id"] = sessions[0] if len(sessions) == 1 else sessions
+                metadata["tags"] = sorted({t for i in members for t in values(i, "tags") if t})
+                metadata["merged_hashes"] = sorted({
+                    h for i in members if i != keep
+                    for h in values(i, "content_hash") + values(i, "merged_hashes") if h
+                })
+                metadata["merged_count"] = sum(docs[i].metadata.get("merged_count", 1) for i in members)
+
+            texts.append(docs[keep].page_content)
+            kept_vectors.append(vectors[keep])
+            metadatas.append(metadata)
+            ids.append(self.db.index_to_docstore_id[keep])
+
+        self.db = None
+        self.metadata_index = MetadataIndex()
+        self.lexical_index = BM25Index()
+        self._text_bytes = 0
+        self._insert_embeddings(texts, kept_vectors, metadatas, ids)
+        self._maybe_migrate()
+        self.save()
+
+        print(f"Compacted memory from {n} to {len(ids)} insights in {time.perf_counter() - started:.1f}s")
+        return {"before": n, "after": len(ids), "merged": n - len(ids)}
+
     def clear_memory(self, confirm=False):
         if confirm:
+            self._loaded = True
             self.db = None
+            self.metadata_index = MetadataIndex()
+            self.lexical_index = BM25Index()
+            self._mmapped = False
+            self._journal_entries = 0
+            self._text_bytes = 0
+            for name in (INDEX_FILE, DOCSTORE_FILE, INDEXES_FILE, JOURNAL_FILE, META_FILE):
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
             print("Memory cleared.")
         else:
             print("Pass confirm=True to clear memory.")
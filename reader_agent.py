@@ -1,7 +1,11 @@
 import json
 import time
-from typing import Dict, Any, Optional
+import asyncio
+from typing import Dict, Any, Optional, Generator, Tuple
 from llm_validator import LLMValidator
+from async_support import ainvoke
+from response_cache import TTLCache, cache_key, model_identity
+from retry_policy import RetryPolicy, REPROMPT, FATAL
 
 
 # JSON schema used to validate the plan generated by the ReaderAgent
@@ -20,6 +24,10 @@ PLAN_SCHEMA = {
 }
 
 
+class PlanRejected(Exception):
+    """The model answered, but the plan is unusable; the next attempt re-prompts."""
+
+
 class ReaderAgent:
     """
     Reader Agent (Autonomous Dynamic System Planner)
@@ -28,13 +36,33 @@ class ReaderAgent:
     - Lets the LLM invent its own architecture dynamically
     - Avoids static archetypes like ReaderAgent/WriterAgent/ValidatorAgent
     - Produces a validated plan that the Writer Agent can consume
+    - Optionally memoizes validated plans for identical prompts (plan_cache)
     """
 
-    def __init__(self, llm_client, validator: LLMValidator, max_retries: int = 2, retry_delay: float = 0.8):
+    def __init__(
+        self,
+        llm_client,
+        validator: LLMValidator,
+        max_retries: int = 2,
+        retry_delay: float = 0.8,
+        plan_cache: Optional[TTLCache] = None,
+        retry_policy: Optional[RetryPolicy] = None
+    ):
+        """
+        Args:
+            max_retries, retry_delay: shorthand for RetryPolicy(max_attempts=max_retries + 1,
+                base_delay=retry_delay) when no retry_policy is given.
+            plan_cache: opt-in cache of validated plans, keyed on the plan prompt,
+                instruction, model deployment and temperature. Off by default since
+                a repeated prompt then returns the same plan instead of a fresh one.
+            retry_policy: error classification, backoff and the shared retry budget.
+        """
         self.llm = llm_client
         self.validator = validator
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.plan_cache = plan_cache
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=max_retries + 1, base_delay=retry_delay)
 
     def _build_plan_prompt(self, enhanced_prompt: str) -> str:
         """Construct the prompt that will guide the LLM to create a structured architecture plan."""
@@ -100,71 +128,103 @@ Return only JSON below.
 
         return {}
 
-    def plan_from_prompt(self, enhanced_prompt: str, instruction: Optional[str] = None) -> Dict[str, Any]:
+    def _plan_cache_key(self, prompt: str, instruction: Optional[str]) -> str:
+        return cache_key(prompt, instruction or "", model_identity(self.llm))
+
+    def _cached_plan(self, key: str) -> Optional[Dict[str, Any]]:
+        """A cached plan result, re-checked against PLAN_SCHEMA; stale or invalid entries are dropped."""
+        cached = self.plan_cache.get(key)
+        if cached is None:
+            return None
+
+        entry = json.loads(cached)
+        session = self.validator.session(
+            json.dumps(entry["plan"]), expected_schema=PLAN_SCHEMA, require_json=True, parsed=entry["plan"]
+        )
+        if session.status == "fail" or session.schema_errors:
+            print("Cached plan no longer passes schema validation, regenerating.")
+            self.plan_cache.invalidate(key)
+            return None
+
+        print("Architecture plan served from plan cache.")
+        return {
+            "success": True,
+            "plan": entry["plan"],
+            "validation_report": entry["validation_report"],
+            "attempts": 0,
+            "error": None,
+            "cached": True
+        }
+
+    def _plan_steps(
+        self, enhanced_prompt: str, instruction: Optional[str]
+    ) -> Generator[Tuple[str, Any], Any, Dict[str, Any]]:
         """
-        Main pipeline that uses the LLM to create an autonomous plan.
-        It validates each response and retries when structure or fidelity issues occur.
+        The planning loop, written once for both plan_from_prompt and aplan_from_prompt.
+        It yields the I/O it needs as ("invoke", prompt), ("llm_check", ValidationSession)
+        or ("sleep", seconds) and receives the result (or the raised exception) back.
         """
-        prompt = self._build_plan_prompt(enhanced_prompt)
+        base_prompt = prompt = self._build_plan_prompt(enhanced_prompt)
+        policy = self.retry_policy
         attempts = 0
         last_error = None
+        kind = None
+
+        key = None
+        if self.plan_cache is not None:
+            key = self._plan_cache_key(base_prompt, instruction)
+            cached = self._cached_plan(key)
+            if cached is not None:
+                return cached
 
-        while attempts <= self.max_retries:
+        while True:
             attempts += 1
             print(f"Attempt {attempts}: Asking LLM for architecture plan.")
             try:
-                llm_resp = self.llm.invoke(prompt)
+                llm_resp = yield "invoke", prompt
                 content = getattr(llm_resp, "content", None) or getattr(llm_resp, "text", None) or str(llm_resp)
                 plan_candidate = self._parse_json(content)
 
                 if plan_candidate is None:
-                    last_error = "Invalid or non-JSON response."
-                    print("JSON invalid, retrying...")
-                    time.sleep(self.retry_delay)
-                    continue
+                    print("JSON invalid, re-prompting...")
+                    raise PlanRejected("Invalid or non-JSON response.")
 
                 # Normalize components if the model returned a list
                 if "components" in plan_candidate:
                     plan_candidate["components"] = self._normalize_components(plan_candidate["components"])
 
-                # Structural schema validation
-                v_report = self.validator.validate_response(
-                    response_text=json.dumps(plan_candidate),
+                # Structural schema validation: serialized, parsed and checked once
+                session = self.validator.session(
+                    json.dumps(plan_candidate),
                     expected_schema=PLAN_SCHEMA,
                     instruction=instruction or "Autonomous system plan generation",
                     require_json=True,
-                    run_llm_check=False
+                    parsed=plan_candidate,
+                    stage="plan"
                 )
 
-                if v_report.get("status") == "fail":
-                    last_error = f"Schema invalid: {v_report.get('issues')}"
-                    print("Schema validation failed, retrying...")
-                    time.sleep(self.retry_delay)
-                    continue
+                if session.status == "fail" or session.schema_errors:
+                    print("Schema validation failed, re-prompting...")
+                    # Every violation, so the re-prompt can fix them all at once.
+                    problems = list(session.iter_schema_errors()) or session.local_report().get("issues")
+                    raise PlanRejected(f"Schema invalid: {problems}")
 
-                # Deep validation using LLM check
-                v_report_full = self.validator.validate_response(
-                    response_text=json.dumps(plan_candidate),
-                    expected_schema=PLAN_SCHEMA,
-                    instruction=instruction or "Autonomous system plan generation",
-                    require_json=True,
-                    run_llm_check=True
-                )
+                # Deep validation: the LLM check on top of the same session
+                v_report_full = yield "llm_check", session
 
                 if v_report_full.get("status") == "fail":
-                    last_error = f"LLM validator rejected plan: {v_report_full.get('issues')}"
-                    time.sleep(self.retry_delay)
-                    continue
+                    raise PlanRejected(f"LLM validator rejected plan: {v_report_full.get('issues')}")
 
                 # Reject generic placeholder names
                 bad_names = ["readeragent", "writeragent", "validatoragent", "improveragent", "coordinatoragent"]
                 comp_names = [n.lower() for n in plan_candidate.get("components", {}).keys()]
                 if any(b in n for n in comp_names for b in bad_names):
                     print("Generic agent names detected, requesting a more creative plan.")
-                    time.sleep(self.retry_delay)
-                    continue
+                    raise PlanRejected("Generic agent names such as ReaderAgent or WriterAgent were used.")
 
                 print("Architecture plan validated successfully.")
+                if key is not None:
+                    self.plan_cache.put(key, json.dumps({"plan": plan_candidate, "validation_report": v_report_full}))
                 return {
                     "success": True,
                     "plan": plan_candidate,
@@ -174,16 +234,77 @@ Return only JSON below.
                 }
 
             except Exception as e:
+                kind = REPROMPT if isinstance(e, PlanRejected) else policy.classify(e)
                 last_error = str(e)
-                print(f"Exception during planning: {last_error}")
-                time.sleep(self.retry_delay)
-                continue
+                if kind != REPROMPT:
+                    print(f"Exception during planning ({kind}): {last_error}")
+
+                if not policy.should_retry(kind, attempts):
+                    break
+                if kind == REPROMPT:
+                    # Tell the model what was wrong instead of sending the same prompt again.
+                    prompt = (
+                        f"{base_prompt}\n\nYour previous answer was rejected: {last_error}\n"
+                        "Fix this and return one valid JSON object only."
+                    )
+                delay = policy.delay(kind, attempts, e)
+                if delay > 0:
+                    yield "sleep", delay
 
-        print("Failed to generate a valid autonomous plan after retries.")
+        if kind == FATAL:
+            print("Non-retryable error, giving up on planning.")
+        else:
+            print("Failed to generate a valid autonomous plan after retries.")
         return {
             "success": False,
             "plan": None,
             "validation_report": None,
             "attempts": attempts,
-            "error": last_error or "unknown"
+            "error": last_error or "unknown",
+            "error_kind": kind
         }
+
+    def plan_from_prompt(self, enhanced_prompt: str, instruction: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Main pipeline that uses the LLM to create an autonomous plan.
+        It validates each response and retries when structure or fidelity issues occur.
+        """
+        steps = self._plan_steps(enhanced_prompt, instruction)
+        reply, error = None, None
+        while True:
+            try:
+                op, arg = steps.throw(error) if error is not None else steps.send(reply)
+            except StopIteration as done:
+                return done.value
+
+            reply, error = None, None
+            try:
+                if op == "invoke":
+                    reply = self.llm.invoke(arg)
+                elif op == "llm_check":
+                    reply = arg.full_report()
+                else:
+                    time.sleep(arg)
+            except Exception as e:
+                error = e
+
+    async def aplan_from_prompt(self, enhanced_prompt: str, instruction: Optional[str] = None) -> Dict[str, Any]:
+        """plan_from_prompt without blocking the event loop: ainvoke, async validation and asyncio.sleep."""
+        steps = self._plan_steps(enhanced_prompt, instruction)
+        reply, error = None, None
+        while True:
+            try:
+                op, arg = steps.throw(error) if error is not None else steps.send(reply)
+            except StopIteration as done:
+                return done.value
+
+            reply, error = None, None
+            try:
+                if op == "invoke":
+                    reply = await ainvoke(self.llm, arg)
+                elif op == "llm_check":
+                    reply = await arg.afull_report()
+                else:
+                    await asyncio.sleep(arg)
+            except Exception as e:
+                error = e
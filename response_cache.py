@@ -0,0 +1,183 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+def cache_key(*parts: object) -> str:
+    """sha256 over the parts, NUL-separated so ("ab", "c") and ("a", "bc") differ."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def model_identity(llm) -> str:
+    """Deployment/model name and temperature of an LLM client, for cache keys."""
+    name = getattr(llm, "deployment_name", None) or getattr(llm, "model_name", None) or type(llm).__name__
+    return f"{name}|{getattr(llm, 'temperature', '')}"
+
+
+class TTLCache:
+    """
+    In-memory response cache
+    ------------------------
+    - Maps string keys to serialized (JSON) values, so callers never share mutable objects
+    - Entries expire `ttl_s` seconds after they were stored
+    - Least-recently-used entries are evicted beyond `max_entries`
+    - Thread-safe; hits and misses are counted for stats()
+    """
+
+    def __init__(self, ttl_s: float = 3600.0, max_entries: int = 256):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.time():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_s, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries)
+        }
+
+
+class PersistentTTLCache(TTLCache):
+    """
+    Two-tier response cache
+    -----------------------
+    - The TTLCache LRU in memory, in front of a SQLite store that survives restarts
+    - Disk rows expire with the same TTL; beyond `max_disk_entries` the
+      least-recently-used rows are evicted
+    - stats() also reports how many hits were served from disk
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_s: float = 86400.0,
+        max_entries: int = 1024,
+        max_disk_entries: int = 50_000
+    ):
+        """
+        Args:
+            path: SQLite file; its directory is created if needed.
+            ttl_s: seconds an entry stays valid, in memory and on disk.
+            max_entries: LRU capacity of the in-memory tier.
+            max_disk_entries: rows kept on disk.
+        """
+        super().__init__(ttl_s=ttl_s, max_entries=max_entries)
+        self.max_disk_entries = max_disk_entries
+        self.disk_hits = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)")
+        self._conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+        self._conn.commit()
+        self._disk_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        value = super().get(key)
+        if value is not None:
+            return value
+
+        now = time.time()
+        with self._disk_lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ? AND expires_at >= ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+
+        value, expires_at = row
+        with self._lock:
+            # The miss counted by the memory tier turns into a (disk) hit.
+            self.misses -= 1
+            self.hits += 1
+            self.disk_hits += 1
+            self._entries[key] = (expires_at, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def put(self, key: str, value: str):
+        super().put(key, value)
+        now = time.time()
+        with self._disk_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl_s, now)
+            )
+            rows = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if rows > self.max_disk_entries:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)",
+                    (rows - self.max_disk_entries,)
+                )
+            self._conn.commit()
+
+    def invalidate(self, key: str):
+        super().invalidate(key)
+        with self._disk_lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        super().clear()
+        with self._disk_lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        stats = super().stats()
+        with self._disk_lock:
+            stats["disk_entries"] = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        stats["disk_hits"] = self.disk_hits
+        return stats
@@ -0,0 +1,144 @@
+import time
+import random
+import threading
+from typing import Optional
+
+# How a failure should be handled.
+TRANSIENT = "transient"  # rate limit, timeout, connection drop, 5xx: back off and retry
+REPROMPT = "reprompt"    # the model answered, but unusably (bad JSON, schema): ask again
+FATAL = "fatal"          # auth, permissions, missing deployment, bad request: give up now
+
+# Matched against the exception's class hierarchy by name, so neither openai nor
+# httpx has to be imported to classify their errors.
+_TRANSIENT_ERRORS = {
+    "RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError",
+    "TimeoutException", "NetworkError", "RemoteProtocolError", "TimeoutError", "ConnectionError"
+}
+_FATAL_ERRORS = {
+    "AuthenticationError", "PermissionDeniedError", "NotFoundError", "BadRequestError",
+    "UnprocessableEntityError"
+}
+_REPROMPT_ERRORS = {"JSONDecodeError", "ValidationError", "OutputParserException"}
+
+
+class RetryBudget:
+    """
+    Process-wide retry budget
+    -------------------------
+    - Token bucket: every retry takes a token, tokens refill at `refill_per_s`
+    - Shared by every agent and run, so a burst of 429s cannot turn into a
+      retry storm: once the bucket is empty, failures surface instead of retrying
+    """
+
+    def __init__(self, capacity: float = 20.0, refill_per_s: float = 1.0):
+        self.capacity = capacity
+        self.refill_per_s = refill_per_s
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_s)
+            self._updated = now
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            elapsed = time.monotonic() - self._updated
+            return min(self.capacity, self._tokens + elapsed * self.refill_per_s)
+
+
+DEFAULT_RETRY_BUDGET = RetryBudget()
+
+
+class RetryPolicy:
+    """
+    Retry policy for LLM calls
+    --------------------------
+    - Classifies failures as transient, reprompt or fatal
+    - Transient failures back off exponentially with full jitter, never less than
+      the server's Retry-After, and draw on a shared RetryBudget
+    - Reprompts retry immediately (the endpoint is healthy) without using the budget
+    - Fatal failures are not retried
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        reprompt_delay: float = 0.0,
+        budget: Optional[RetryBudget] = None
+    ):
+        """
+        Args:
+            max_attempts: total attempts per call, including the first.
+            base_delay: backoff before the first retry; doubles on every attempt.
+            max_delay: backoff cap (a longer Retry-After still wins).
+            reprompt_delay: pause before asking again after an unusable answer.
+            budget: retry budget; defaults to the process-wide DEFAULT_RETRY_BUDGET.
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.reprompt_delay = reprompt_delay
+        self.budget = budget if budget is not None else DEFAULT_RETRY_BUDGET
+
+    def classify(self, error: BaseException) -> str:
+        names = {cls.__name__ for cls in type(error).__mro__}
+        if names & _FATAL_ERRORS:
+            return FATAL
+        if names & _TRANSIENT_ERRORS:
+            return TRANSIENT
+        if names & _REPROMPT_ERRORS:
+            return REPROMPT
+
+        status = getattr(error, "status_code", None)
+        if isinstance(status, int):
+            if status in (408, 409, 429) or status >= 500:
+                return TRANSIENT
+            if 400 <= status < 500:
+                return FATAL
+        # Unknown errors keep the old behaviour: back off and try again.
+        return TRANSIENT
+
+    def retry_after(self, error: Optional[BaseException]) -> Optional[float]:
+        """Seconds the server asked us to wait (Retry-After / retry-after-ms), if any."""
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        if not headers:
+            return None
+        try:
+            if headers.get("retry-after-ms") is not None:
+                return float(headers["retry-after-ms"]) / 1000.0
+            if headers.get("retry-after") is not None:
+                return float(headers["retry-after"])
+        except (TypeError, ValueError):
+            return None
+        return None
+
+    def backoff(self, attempt: int, error: Optional[BaseException] = None) -> float:
+        """Delay before attempt `attempt + 1`: full-jitter exponential, at least Retry-After."""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = random.uniform(0.0, ceiling)
+        server_delay = self.retry_after(error)
+        if server_delay is not None:
+            # A little jitter on top keeps clients that got the same header apart.
+            delay = max(delay, server_delay + random.uniform(0.0, self.base_delay))
+        return delay
+
+    def should_retry(self, kind: str, attempt: int) -> bool:
+        """Whether a failure of `kind` on attempt `attempt` (1-based) gets another attempt."""
+        if kind == FATAL or attempt >= self.max_attempts:
+            return False
+        if kind == REPROMPT:
+            return True
+        return self.budget.try_acquire()
+
+    def delay(self, kind: str, attempt: int, error: Optional[BaseException] = None) -> float:
+        return self.reprompt_delay if kind == REPROMPT else self.backoff(attempt, error)
@@ -0,0 +1,99 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# A keyword must start a word: not inside an identifier ("skill", "handleAttack")
+# or a dotted name ("os.kill"). It may carry an inflection from a closed list
+# ("hacking", "exploits", "terrorist") but not any other word ending ("bombastic",
+# "hackathon", "killall"), an identifier continuation ("attack_surface",
+# "attackSurface", "kill2") or a call ("kill(pid)"). File names ("malware.exe") match.
+_BEFORE = r"(?<![\w.])"
+_SUFFIX = r"(?:s|es|ed|d|ing|er|ers|ist|ists|ation|ations)?"
+_AFTER = r"(?![\w(])"
+
+
+class SafetyMatch(NamedTuple):
+    term: str
+    start: int
+    end: int
+
+
+def _trie_pattern(node: Dict[str, dict]) -> Optional[str]:
+    """Regex for a character trie: shared prefixes are matched once and longer terms win."""
+    if "" in node and len(node) == 1:
+        return None
+
+    alternatives, single_chars = [], []
+    optional = False
+    for ch in sorted(node, reverse=True):
+        if ch == "":
+            optional = True
+            continue
+        rest = _trie_pattern(node[ch])
+        # Any run of whitespace separates the words of a multi-word term.
+        head = r"\s+" if ch == " " else re.escape(ch)
+        if rest is None and ch != " ":
+            single_chars.append(head)
+        else:
+            alternatives.append(head + (rest or ""))
+
+    if single_chars:
+        alternatives.append(single_chars[0] if len(single_chars) == 1 else f"[{''.join(single_chars)}]")
+    pattern = alternatives[0] if len(alternatives) == 1 else f"(?:{'|'.join(alternatives)})"
+    return f"(?:{pattern})?" if optional else pattern
+
+
+def _normalize(term: str) -> str:
+    return " ".join(term.lower().split())
+
+
+class SafetyScanner:
+    """
+    Multi-keyword safety scanner
+    ----------------------------
+    - All keywords are compiled into one trie-shaped regex, so a scan is a single
+      pass over the text however many keywords there are
+    - Case-insensitive; multi-word terms match across any whitespace
+    - Inflected forms match ("exploits", "hacking"); identifiers, dotted names and
+      calls that merely contain a keyword are not reported
+    - Use get_scanner() to build each keyword set only once
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = sorted({_normalize(k) for k in keywords if k and k.strip()})
+        trie: Dict[str, dict] = {}
+        for keyword in self.keywords:
+            node = trie
+            for ch in keyword:
+                node = node.setdefault(ch, {})
+            node[""] = {}
+        body = _trie_pattern(trie) if trie else None
+        self._regex = (
+            re.compile(f"{_BEFORE}(?P<term>{body}){_SUFFIX}{_AFTER}", re.IGNORECASE) if body else None
+        )
+
+    def scan(self, text: str) -> List[SafetyMatch]:
+        """
+        Every keyword occurrence, in order: the keyword it matched and the span of the
+        whole word in `text` (suffix included).
+        """
+        if self._regex is None:
+            return []
+        return [SafetyMatch(_normalize(m.group("term")), m.start(), m.end()) for m in self._regex.finditer(text)]
+
+    def terms(self, text: str) -> Tuple[List[str], Dict[str, List[int]]]:
+        """Distinct matched keywords in order of first appearance, and their start offsets."""
+        positions: Dict[str, List[int]] = {}
+        for match in self.scan(text):
+            positions.setdefault(match.term, []).append(match.start)
+        return list(positions), positions
+
+
+@lru_cache(maxsize=32)
+def _cached_scanner(keywords: Tuple[str, ...]) -> SafetyScanner:
+    return SafetyScanner(keywords)
+
+
+def get_scanner(keywords: Iterable[str]) -> SafetyScanner:
+    """Scanner for a keyword set, compiled on first use and shared afterwards."""
+    return _cached_scanner(tuple(sorted({_normalize(k) for k in keywords if k and k.strip()})))
@@ -0,0 +1,101 @@
+import copy
+import json
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from jsonschema.validators import validator_for
+
+
+def schema_key(schema: Dict[str, Any]) -> str:
+    """Content hash of a schema; equal schemas share one compiled validator."""
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _format_error(error) -> str:
+    path = "/".join(str(p) for p in error.absolute_path)
+    return f"at '{path}': {error.message}" if path else error.message
+
+
+class CompiledSchema:
+    """
+    One schema, checked against its metaschema once and compiled once.
+    - is_valid(): fast path; uses a fastjsonschema code-generated validator when available
+    - iter_errors(): every violation, produced lazily by jsonschema
+    """
+
+    def __init__(self, schema: Dict[str, Any], fast: bool = True):
+        # A private copy: later changes to the caller's dict must not alter a cached validator.
+        self.schema = copy.deepcopy(schema)
+        cls = validator_for(self.schema)
+        cls.check_schema(self.schema)
+        self._validator = cls(self.schema)
+        self._fast: Optional[Callable[[Any], Any]] = self._compile_fast() if fast else None
+
+    def _compile_fast(self) -> Optional[Callable[[Any], Any]]:
+        try:
+            import fastjsonschema
+        except ImportError:
+            return None
+        try:
+            return fastjsonschema.compile(self.schema)
+        except Exception:
+            # Schemas fastjsonschema cannot compile still validate through jsonschema.
+            return None
+
+    @property
+    def fast_path(self) -> bool:
+        return self._fast is not None
+
+    def is_valid(self, data: Any) -> bool:
+        if self._fast is not None:
+            try:
+                self._fast(data)
+                return True
+            except Exception:
+                return False
+        return self._validator.is_valid(data)
+
+    def iter_errors(self, data: Any) -> Iterator[str]:
+        """Readable messages for every violation, computed one at a time."""
+        for error in self._validator.iter_errors(data):
+            yield _format_error(error)
+
+    def first_error(self, data: Any) -> Optional[str]:
+        """None when valid; otherwise the first violation (valid data takes the fast path)."""
+        if self.is_valid(data):
+            return None
+        return next(self.iter_errors(data), None)
+
+
+class SchemaRegistry:
+    """
+    Schema registry
+    ---------------
+    - Compiles each distinct schema once, keyed by its content hash
+    - Thread-safe; compiled validators are shared by every LLMValidator
+    """
+
+    def __init__(self, fast: bool = True):
+        self.fast = fast
+        self._compiled: Dict[str, CompiledSchema] = {}
+        self._lock = threading.Lock()
+
+    def compile(self, schema: Dict[str, Any]) -> CompiledSchema:
+        key = schema_key(schema)
+        with self._lock:
+            compiled = self._compiled.get(key)
+            if compiled is None:
+                compiled = CompiledSchema(schema, fast=self.fast)
+                self._compiled[key] = compiled
+        return compiled
+
+    def __len__(self) -> int:
+        return len(self._compiled)
+
+
+default_registry = SchemaRegistry()
+
+
+def compile_schema(schema: Dict[str, Any]) -> CompiledSchema:
+    return default_registry.compile(schema)
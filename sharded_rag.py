@@ -0,0 +1,242 @@
+import os
+import re
+import json
+import shutil
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Optional
+
+from rag_manager import RAGManager, make_embedding_model
+from lexical_index import reciprocal_rank_fusion
+
+SHARD_FILE = "shard.json"
+
+
+class ShardedRAGManager:
+    """
+    Sharded Corrective Memory
+    -------------------------
+    - One RAGManager (own FAISS index, journal and snapshot) per tenant or session
+    - A router embeds the query once, searches the relevant shards in parallel,
+      merges their vector and lexical rankings and fuses them once (RRF) when hybrid
+    - Shards are opened on demand and evicted least-recently-used once the
+      estimated resident size passes `memory_budget_mb`
+    - One embeddings client (and cache) is shared by every shard
+    """
+
+    def __init__(
+        self,
+        base_dir: str = "./rag_memory",
+        shard_by: str = "session_id",
+        memory_budget_mb: float = 512,
+        max_workers: int = 8,
+        embedding_backend: Optional[str] = None,
+        embedding_cache: bool = True,
+        **rag_kwargs
+    ):
+        """
+        Args:
+            base_dir: shards live under base_dir/shards/<key>.
+            shard_by: insight field used as shard key when no "tenant_id" is present.
+            memory_budget_mb: estimated resident size above which idle shards are evicted.
+            max_workers: threads used to search shards in parallel.
+            rag_kwargs: passed to every shard's RAGManager (index_type, mmap, ...).
+        """
+        self.base_dir = base_dir
+        self.shard_dir = os.path.join(base_dir, "shards")
+        self.shard_by = shard_by
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.max_workers = max_workers
+        self.embedding_backend = embedding_backend
+        self.embedding_cache = embedding_cache
+        self.rag_kwargs = rag_kwargs
+
+        self._embeddings = None
+        self._open: "OrderedDict[str, RAGManager]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def embeddings(self):
+        """Embeddings client shared by all shards, built on first access."""
+        if self._embeddings is None:
+            base = make_embedding_model(self.embedding_backend)
+            self._embeddings = base
+            if self.embedding_cache:
+                from embedding_cache import CachedEmbeddings
+
+                self._embeddings = CachedEmbeddings(
+                    base, cache_dir=os.path.join(self.base_dir, "embedding_cache")
+                )
+        return self._embeddings
+
+    def shard_key(self, insight_package: Dict[str, Any]) -> str:
+        return str(insight_package.get("tenant_id") or insight_package.get(self.shard_by) or "default")
+
+    def _shard_path(self, key: str) -> str:
+        # Readable prefix plus a hash, so distinct keys never share a directory.
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", key)[:48]
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:10]
+        return os.path.join(self.shard_dir, f"{safe}-{digest}")
+
+    def list_shards(self) -> List[str]:
+        """Keys of every shard on disk or currently open."""
+        keys = set(self._open)
+        if os.path.isdir(self.shard_dir):
+            for name in os.listdir(self.shard_dir):
+                marker = os.path.join(self.shard_dir, name, SHARD_FILE)
+                if os.path.exists(marker):
+                    with open(marker, "r", encoding="utf-8") as f:
+                        keys.add(json.load(f)["key"])
+        return sorted(keys)
+
+    def shard(self, key: str) -> RAGManager:
+        """Open (or touch) a shard and evict others if the memory budget is exceeded."""
+        with self._lock:
+            rag = self._open.get(key)
+            if rag is None:
+                path = self._shard_path(key)
+                os.makedirs(path, exist_ok=True)
+                marker = os.path.join(path, SHARD_FILE)
+                if not os.path.exists(marker):
+                    with open(marker, "w", encoding="utf-8") as f:
+                        json.dump({"key": key}, f)
+
+                rag = RAGManager(persist_dir=path, embeddings=self.embeddings, **self.rag_kwargs)
+                self._open[key] = rag
+            self._open.move_to_end(key)
+            return rag
+
+    def _account(self, key: str, refresh: bool = True):
+        """Update one shard's size estimate, then evict LRU shards while over budget."""
+        with self._lock:
+            rag = self._open.get(key)
+            if rag is None:
+                return
+            if refresh or key not in self._sizes:
+                self._sizes[key] = rag.memory_bytes()
+
+            while sum(self._sizes.values()) > self.memory_budget:
+                victim = next((k for k in self._open if k != key), None)
+                if victim is None:
+                    break
+                evicted = self._open.pop(victim)
+                # Clean shards are just dropped; their snapshot on disk is already current.
+                if evicted.dirty:
+                    evicted.save()
+                self._sizes.pop(victim, None)
+                print(f"Evicted memory shard '{victim}'.")
+
+    def add_corrective_insight(self, insight_package: Dict):
+        key = self.shard_key(insight_package)
+        result = self.shard(key).add_corrective_insight(insight_package)
+        self._account(key)
+        return {**result, "shard": key}
+
+    def add_corrective_insights(self, insight_packages: Iterable[Dict], chunk_size: int = 64) -> Dict:
+        """Bulk ingestion: each chunk is grouped by shard and ingested shard by shard."""
+        stream = iter(insight_packages)
+        totals = {"stored": 0, "duplicates": 0, "shards": set()}
+
+        while True:
+            chunk = list(islice(stream, chunk_size))
+            if not chunk:
+                break
+
+            groups: Dict[str, List[Dict]] = {}
+            for pkg in chunk:
+                groups.setdefault(self.shard_key(pkg), []).append(pkg)
+
+            for key, packages in groups.items():
+                result = self.shard(key).add_corrective_insights(packages, chunk_size=chunk_size)
+                self._account(key)
+                totals["stored"] += result["stored"]
+                totals["duplicates"] += result["duplicates"]
+                totals["shards"].add(key)
+                if result["status"] != "stored":
+                    return {"status": "partial", "stored": totals["stored"], "duplicates": totals["duplicates"],
+                            "shards": sorted(totals["shards"]), "error": result["error"]}
+
+        return {"status": "stored", "stored": totals["stored"], "duplicates": totals["duplicates"],
+                "shards": sorted(totals["shards"]), "error": None}
+
+    def fetch_context(
+        self,
+        query: str,
+        k: int = 3,
+        shards: Optional[List[str]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict]:
+        """
+        Search the given shards (default: all of them) and merge their top-k. Each
+        shard's vector hits are merged by distance and its lexical hits by BM25 score;
+        when the shards rank hybrid, the two merged rankings are then fused once (RRF).
+        Pass the tenant's own shard keys whenever possible; searching every shard
+        opens every shard.
+        """
+        try:
+            keys = shards if shards is not None else self.list_shards()
+            if not keys:
+                return []
+            query_vector = self.embeddings.embed_query(query)
+
+            def search(key: str):
+                vector_hits, lexical_hits = self.shard(key).search_rankings(
+                    query_vector, k=k, filters=filters, query=query
+                )
+                self._account(key, refresh=False)
+                return (
+                    [((key, p), {**r, "shard": key}) for p, r in vector_hits],
+                    [((key, p), {**r, "shard": key}) for p, r in lexical_hits]
+                )
+
+            vector_hits, lexical_hits = [], []
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(keys))) as pool:
+                for shard_vector, shard_lexical in pool.map(search, keys):
+                    vector_hits.extend(shard_vector)
+                    lexical_hits.extend(shard_lexical)
+
+            vector_hits.sort(key=lambda hit: hit[1]["similarity"])
+            if not lexical_hits:
+                return [r for _, r in vector_hits[:k]]
+
+            # Per-shard fused scores only rank within their shard; fusing the globally
+            # merged rankings keeps lexical-only hits from every shard in contention.
+            lexical_hits.sort(key=lambda hit: -hit[1]["bm25_score"])
+            results = dict(lexical_hits)
+            results.update(vector_hits)
+            fused = reciprocal_rank_fusion(
+                [[hit for hit, _ in vector_hits], [hit for hit, _ in lexical_hits]],
+                k=self.rag_kwargs.get("rrf_k", 60)
+            )[:k]
+            return [{**results[hit], "rrf_score": rrf_score} for hit, rrf_score in fused]
+        except Exception as e:
+            print(f"Error fetching context: {e}")
+            return []
+
+    async def afetch_context(self, query: str, k: int = 3, **kwargs) -> List[Dict]:
+        """fetch_context on a worker thread, so embedding and search do not block the event loop."""
+        return await asyncio.to_thread(self.fetch_context, query, k, **kwargs)
+
+    def save(self):
+        with self._lock:
+            for rag in self._open.values():
+                rag.save()
+
+    def clear_memory(self, confirm=False, shard: Optional[str] = None):
+        """Drop one shard, or every shard when `shard` is None."""
+        if not confirm:
+            print("Pass confirm=True to clear memory.")
+            return
+
+        with self._lock:
+            keys = [shard] if shard is not None else self.list_shards()
+            for key in keys:
+                self._open.pop(key, None)
+                self._sizes.pop(key, None)
+                shutil.rmtree(self._shard_path(key), ignore_errors=True)
+        print(f"Memory cleared for {len(keys)} shard(s).")
@@ -0,0 +1,62 @@
+import math
+import random
+import unittest
+
+import numpy as np
+
+from lexical_index import BM25Index, tokenize
+
+
+def _brute_force(texts, query, k, candidates=None, k1=1.5, b=0.75):
+    docs = [tokenize(text) for text in texts]
+    avg_len = sum(len(d) for d in docs) / len(docs)
+    allowed = set(range(len(docs))) if candidates is None else set(int(c) for c in candidates)
+    scores = {}
+    for term in set(tokenize(query)):
+        containing = [i for i, d in enumerate(docs) if term in d]
+        idf = math.log(1.0 + (len(docs) - len(containing) + 0.5) / (len(containing) + 0.5))
+        for i in containing:
+            if i in allowed:
+                tf = docs[i].count(term)
+                norm = k1 * (1.0 - b + b * len(docs[i]) / avg_len)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (k1 + 1.0) / (tf + norm)
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+
+class BM25SearchTest(unittest.TestCase):
+    """Sparse (rare terms) and dense (common terms) scoring both match plain BM25."""
+
+    def setUp(self):
+        rng = random.Random(7)
+        vocabulary = [f"term{chr(97 + i % 26)}{chr(97 + i // 26)}" for i in range(400)]
+        self.texts = [
+            " ".join(rng.choices(vocabulary, k=rng.randint(5, 40)) + ["error"] * rng.randint(0, 1))
+            for _ in range(2000)
+        ]
+        self.index = BM25Index()
+        self.index.add_many(0, self.texts)
+        self.candidates = np.arange(0, 2000, 3, dtype=np.int64)
+
+    def _check(self, query, candidates=None):
+        got = self.index.search(query, 10, candidates)
+        expected = _brute_force(self.texts, query, 10, candidates)
+        self.assertEqual(len(got), len(expected))
+        for (position, score), (_, expected_score) in zip(got, expected):
+            self.assertAlmostEqual(score, expected_score, places=4)
+            self.assertAlmostEqual(dict(_brute_force(self.texts, query, 2000, candidates))[position], score, places=4)
+
+    def test_rare_terms(self):
+        self._check("termab termqc")
+        self._check("termab termqc", self.candidates)
+
+    def test_common_terms(self):
+        self._check("error termab")
+        self._check("error termab", self.candidates)
+
+    def test_no_match(self):
+        self.assertEqual(self.index.search("missing", 5), [])
+        self.assertEqual(self.index.search("termab", 5, np.array([], dtype=np.int64)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import json
+import re
+import unittest
+
+from llm_validator import LLMValidator
+
+
+class _Reply:
+    def __init__(self, content):
+        self.content = content
+
+
+class _FencedJudge:
+    """Answers every check in a ```json fence, as chat models often do."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        items = len(re.findall(r"^### Item \d+", prompt, re.M))
+        verdict = {"instruction_fidelity_score": 0.9, "safety_score": 1.0, "suggestions": []}
+        body = {str(n): verdict for n in range(1, items + 1)} if items else verdict
+        return _Reply("```json\n" + json.dumps(body) + "\n```")
+
+
+class FencedVerdictTest(unittest.TestCase):
+    def test_packed_reply_in_code_fence(self):
+        judge = _FencedJudge()
+        items = [{"response_text": f"component {i} code " * 20, "instruction": "write component"} for i in range(6)]
+        reports = LLMValidator(judge).validate_many(items)
+
+        self.assertEqual(len(judge.prompts), 1)
+        self.assertEqual([r["scores"]["instruction_fidelity"] for r in reports], [0.9] * 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
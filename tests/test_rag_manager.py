@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from rag_manager import RAGManager
+
+
+def _insights(prefix: str, count: int):
+    return [{"session_id": f"{prefix}{i}", "note": f"{prefix} insight {i} about topic {i * 7919}"} for i in range(count)]
+
+
+class JournalReplayMigrationTest(unittest.TestCase):
+    """Replaying a journal that crosses migrate_threshold migrates (and saves) during the load."""
+
+    def setUp(self):
+        self.persist_dir = tempfile.mkdtemp()
+        self.kwargs = {"embedding_backend": "hashing", "embedding_cache": False, "dedupe_similarity": None}
+
+    def tearDown(self):
+        shutil.rmtree(self.persist_dir, ignore_errors=True)
+
+    def test_replay_across_threshold_does_not_deadlock(self):
+        writer = RAGManager(self.persist_dir, snapshot_every=10_000, **self.kwargs)
+        writer.add_corrective_insights(_insights("snap", 200))
+        writer.save()
+        writer.add_corrective_insights(_insights("journal", 91))
+
+        reader = RAGManager(self.persist_dir, index_type="ivf_flat", migrate_threshold=250, **self.kwargs)
+        results = []
+        search = threading.Thread(
+            target=lambda: results.append(reader.fetch_context("journal insight 5", k=2)), daemon=True
+        )
+        search.start()
+        search.join(timeout=60)
+
+        self.assertFalse(search.is_alive(), "fetch_context deadlocked while replaying the journal")
+        self.assertEqual(len(results[0]), 2)
+        self.assertEqual(reader.db.index.ntotal, 291)
+        self.assertFalse(reader.dirty)
+
+        reopened = RAGManager(self.persist_dir, **self.kwargs)
+        self.assertEqual(len(reopened.fetch_context("snap insight 3", k=1)), 1)
+        self.assertEqual(reopened.db.index.ntotal, 291)
+
+
+class MappedIVFWriteTest(unittest.TestCase):
+    """A memory-mapped IVF snapshot (read-only on-disk inverted lists) must accept writes."""
+
+    def setUp(self):
+        self.persist_dir = tempfile.mkdtemp()
+        self.kwargs = {
+            "embedding_backend": "hashing",
+            "embedding_cache": False,
+            "dedupe_similarity": None,
+            "index_type": "ivf_flat",
+            "migrate_threshold": 100
+        }
+        writer = RAGManager(self.persist_dir, **self.kwargs)
+        writer.add_corrective_insights(_insights("snap", 150))
+        writer.save()
+
+    def tearDown(self):
+        shutil.rmtree(self.persist_dir, ignore_errors=True)
+
+    def _write_and_check(self, rag: RAGManager):
+        self.assertEqual(rag.add_corrective_insight(_insights("fresh", 1)[0])["status"], "stored")
+        self.assertEqual(rag.fetch_context("fresh insight 0", k=1)[0]["metadata"]["session_id"], "fresh0")
+        self.assertEqual(rag.compact()["after"], 151)
+
+        reopened = RAGManager(self.persist_dir, **self.kwargs)
+        self.assertEqual(reopened.fetch_context("fresh insight 0", k=1)[0]["metadata"]["session_id"], "fresh0")
+        self.assertEqual(reopened.db.index.ntotal, 151)
+
+    def test_write_to_mapped_snapshot(self):
+        rag = RAGManager(self.persist_dir, **self.kwargs)
+        rag.fetch_context("snap insight 1", k=1)
+        self.assertTrue(rag._mmapped)
+        self._write_and_check(rag)
+
+    def test_write_after_snapshot_was_replaced(self):
+        rag = RAGManager(self.persist_dir, **self.kwargs)
+        rag.fetch_context("snap insight 1", k=1)
+        # Another process rewrote the snapshot: the mapped lists are copied, not re-read.
+        os.utime(os.path.join(self.persist_dir, "index.faiss"), ns=(0, 0))
+        self._write_and_check(rag)
+
+
+class PersistedIndexesTest(unittest.TestCase):
+    """A load restores the metadata/BM25 indexes saved with the snapshot instead of rebuilding them."""
+
+    def setUp(self):
+        self.persist_dir = tempfile.mkdtemp()
+        self.kwargs = {"embedding_backend": "hashing", "embedding_cache": False, "dedupe_similarity": None}
+        self.writer = RAGManager(self.persist_dir, **self.kwargs)
+        self.writer.add_corrective_insights(_insights("snap", 50))
+        self.writer.save()
+
+    def tearDown(self):
+        shutil.rmtree(self.persist_dir, ignore_errors=True)
+
+    def test_load_uses_persisted_indexes(self):
+        rag = RAGManager(self.persist_dir, **self.kwargs)
+        with mock.patch("rag_manager.BM25Index.from_store") as rebuild:
+            rag.fetch_context("snap insight 7", k=1, filters={"session_id": "snap7"})
+        rebuild.assert_not_called()
+        self.assertEqual(len(rag.lexical_index), 50)
+        self.assertEqual(rag._text_bytes, self.writer._text_bytes)
+        self.assertEqual(rag.fetch_context("snap insight 7", k=1, filters={"session_id": "snap7"})[0]["metadata"]["session_id"], "snap7")
+
+    def test_stale_indexes_are_rebuilt(self):
+        os.replace(os.path.join(self.persist_dir, "indexes.pkl"), os.path.join(self.persist_dir, "old.pkl"))
+        self.writer.add_corrective_insights(_insights("more", 5))
+        self.writer.save()
+        os.replace(os.path.join(self.persist_dir, "old.pkl"), os.path.join(self.persist_dir, "indexes.pkl"))
+
+        rag = RAGManager(self.persist_dir, **self.kwargs)
+        self.assertEqual(rag.fetch_context("more insight 3", k=1, filters={"session_id": "more3"})[0]["metadata"]["session_id"], "more3")
+        self.assertEqual(len(rag.lexical_index), 55)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+
+from safety_scanner import SafetyScanner
+
+
+class KeywordBoundaryTest(unittest.TestCase):
+    """Keywords match with a closed set of inflections, never inside other words."""
+
+    def setUp(self):
+        self.scanner = SafetyScanner(["bomb", "hack", "kill", "terror", "exploit", "attack", "malware"])
+
+    def _terms(self, text):
+        return [m.term for m in self.scanner.scan(text)]
+
+    def test_inflections_match(self):
+        for text, term in [("hacking", "hack"), ("exploits", "exploit"), ("terrorist", "terror"),
+                           ("attackers", "attack"), ("bombed", "bomb"), ("HACKING", "hack"),
+                           ("malware.exe", "malware")]:
+            self.assertEqual(self._terms(text), [term], text)
+
+    def test_other_words_do_not_match(self):
+        for text in ["bombastic", "hackathon", "Bombay", "killall", "skill", "os.kill",
+                     "attack_surface", "attackSurface", "kill2", "kill(pid)"]:
+            self.assertEqual(self._terms(text), [], text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import shutil
+import tempfile
+import unittest
+
+from sharded_rag import ShardedRAGManager
+
+
+class ShardedHybridMergeTest(unittest.TestCase):
+    """Hybrid results are fused over the merged rankings of all shards, not per shard."""
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.rag = ShardedRAGManager(
+            self.base_dir, embedding_backend="hashing", embedding_cache=False, dedupe_similarity=None
+        )
+        for i in range(3):
+            self.rag.add_corrective_insight(
+                {"session_id": "weather", "note": f"weather api timeout when calling forecast endpoint variant {i}"}
+            )
+            self.rag.add_corrective_insight(
+                {"session_id": "db", "note": f"database migration ordering mentions weather table batch {i}"}
+            )
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir, ignore_errors=True)
+
+    def test_best_shard_is_not_interleaved(self):
+        # Each shard's own best hit gets the same per-shard fused score; a weak shard
+        # must not win a slot just for having a best hit.
+        results = self.rag.fetch_context("weather api timeout forecast endpoint", k=3)
+        self.assertEqual([r["shard"] for r in results], ["weather"] * 3)
+        self.assertEqual(results, sorted(results, key=lambda r: -r["rrf_score"]))
+
+    def test_lexical_only_hit_from_other_shard(self):
+        self.rag.add_corrective_insight({"session_id": "codes", "error": "ERR_XK42Z_TIMEOUT", "note": "lorem ipsum"})
+        results = self.rag.fetch_context("ERR_XK42Z_TIMEOUT", k=3)
+        self.assertEqual(results[0]["shard"], "codes")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import asyncio
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from writer_agent import WriterAgent
+
+
+class _SlowStreamingLLM:
+    """Streams one token every 10ms for 3s and records how many streams were started."""
+
+    def __init__(self):
+        self.started = 0
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt):
+        return "def component():\n    return None\n"
+
+    def stream(self, prompt):
+        with self._lock:
+            self.started += 1
+        for _ in range(300):
+            time.sleep(0.01)
+            with self._lock:
+                self.tokens += 1
+            yield "x = 1\n"
+
+
+class AsyncCancellationTest(unittest.TestCase):
+    """Cancelling an async run stops the generation thread instead of leaving it burning LLM calls."""
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.llm = _SlowStreamingLLM()
+        self.writer = WriterAgent(self.llm, base_output_dir=self.output_dir, max_concurrency=1, stream=True)
+        self.plan = {"framework": "langgraph", "components": {f"Step{i}": {"description": "step"} for i in range(3)}}
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def test_cancel_stops_the_pump(self):
+        async def run():
+            task = asyncio.create_task(self.writer.awrite_system_code(self.plan))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            # The default executor stays free for retrieval and other to_thread work.
+            await asyncio.wait_for(asyncio.to_thread(lambda: None), timeout=1)
+
+        asyncio.run(run())
+        tokens = self.llm.tokens
+        time.sleep(0.1)
+        self.assertEqual(self.llm.tokens, tokens)
+        self.assertEqual(self.llm.started, 1)
+
+if __name__ == "__main__":
+    unittest.main()
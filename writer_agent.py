@@ -1,7 +1,28 @@
 import os
 import json
 import time
-from typing import Dict, Any, Optional
+import queue
+import asyncio
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, Optional, Iterator, AsyncIterator, Callable, Tuple
+
+from retry_policy import RetryPolicy
+from component_scheduler import component_dependencies, topological_waves, extract_signatures
+
+# Stored next to the generated files; maps each component to the hash of its prompt
+# inputs and of the file written for it.
+MANIFEST_FILE = ".nexus_manifest.json"
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class GenerationStopped(Exception):
+    """The caller stopped the run (see iter_system_code's `stop`); files already finished are kept."""
 
 
 class WriterAgent:
@@ -11,20 +32,47 @@ class WriterAgent:
     - Consumes a structured plan produced by the ReaderAgent
     - Generates runnable, modular code files for each component
     - Supports LangGraph, CrewAI, AutoGen, and LlamaIndex frameworks
-    - Automatically builds an orchestrator (main.py)
-    - Optionally saves files to disk
+    - Automatically builds an orchestrator (main.py) wired along the dependency DAG
+    - Generates components in dependency waves, each wave concurrently (bounded by max_concurrency)
+    - Regenerates only components whose prompt inputs changed or whose files were edited
+    - Optionally streams tokens straight to disk and yields progress events
+    - Optionally saves files to disk (atomically: temp file, then rename)
     """
 
-    def __init__(self, llm_client=None, base_output_dir: str = "./generated_code", auto_save: bool = True):
+    def __init__(
+        self,
+        llm_client=None,
+        base_output_dir: str = "./generated_code",
+        auto_save: bool = True,
+        max_concurrency: int = 4,
+        incremental: bool = True,
+        stream: bool = False,
+        retry_policy: Optional[RetryPolicy] = None
+    ):
         """
         Args:
             llm_client: LLM instance with .invoke(prompt). If None, a mock generator is used.
             base_output_dir: directory for saving generated files.
             auto_save: whether to automatically save generated files to disk.
+            max_concurrency: maximum number of component LLM calls in flight at once, and of
+                aiter_system_code runs in flight (each on a thread of the writer's own pool).
+            incremental: reuse files from the previous run (tracked in MANIFEST_FILE) when
+                their prompt inputs are unchanged and the file was not edited since.
+            stream: consume the LLM token stream and write each file as it arrives. Saved
+                files are then returned by size only, keeping memory flat for large files.
+            retry_policy: retries for transient LLM errors (rate limits, timeouts), drawing
+                on the same shared retry budget as the other agents.
         """
         self.llm = llm_client or self._mock_llm()
         self.base_output_dir = base_output_dir
         self.auto_save = auto_save
+        self.max_concurrency = max(1, max_concurrency)
+        self.incremental = incremental
+        self.stream = stream
+        self.retry_policy = retry_policy or RetryPolicy()
+        # Async runs block a thread for their whole duration; they get their own pool so
+        # they cannot starve the event loop's default executor (asyncio.to_thread).
+        self._async_pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="writer")
 
         os.makedirs(self.base_output_dir, exist_ok=True)
 
@@ -37,16 +85,36 @@ class WriterAgent:
         print("Using MockLLM (offline mode)")
         return MockLLM()
 
-    def _build_code_prompt(self, component_name: str, details: Dict[str, Any], plan: Dict[str, Any]) -> str:
+    def _build_code_prompt(
+        self,
+        component_name: str,
+        details: Dict[str, Any],
+        plan: Dict[str, Any],
+        dependency_signatures: Optional[Dict[str, str]] = None
+    ) -> str:
         """
         Construct a detailed prompt for generating actual component code.
         The prompt instructs the LLM how to implement the requested component.
+        Signatures of already generated dependencies are included so the component
+        imports and calls them instead of guessing their interface.
         """
         framework = plan.get("framework", "LangGraph")
         language = plan.get("language", "python")
         embedding_model = plan.get("embedding_model", "None")
         llm_model = plan.get("llm", "Unknown")
 
+        dependency_section = ""
+        if dependency_signatures:
+            blocks = [
+                f"# module: {name.lower()}\n{signatures or '# (no public definitions)'}"
+                for name, signatures in dependency_signatures.items()
+            ]
+            dependency_section = (
+                "\nAlready generated dependencies (import from these modules, do not redefine them):\n"
+                + "\n\n".join(blocks)
+                + "\n"
+            )
+
         return f"""
 You are the Writer Agent, a senior {language} developer and AI systems engineer.
 
@@ -63,7 +131,7 @@ System context:
 - Framework: {framework}
 - LLM Model: {llm_model}
 - Embedding Model: {embedding_model}
-
+{dependency_section}
 Instructions:
 1. Write clean, executable, modular {language} code.
 2. Include meaningful class or function definitions.
@@ -76,15 +144,187 @@ Instructions:
 Return valid {language} source code only.
 """.strip()
 
-    def _generate_component_code(self, component_name: str, details: Dict[str, Any], plan: Dict[str, Any]) -> str:
+    def _generate_component_code(
+        self,
+        component_name: str,
+        details: Dict[str, Any],
+        plan: Dict[str, Any],
+        dependency_signatures: Optional[Dict[str, str]] = None
+    ) -> str:
         """
         Use the LLM to generate the actual code implementation for one component.
         """
-        prompt = self._build_code_prompt(component_name, details, plan)
+        prompt = self._build_code_prompt(component_name, details, plan, dependency_signatures)
+        return self._complete(prompt)
+
+    def _complete(self, prompt: str) -> str:
+        """Run one code-generation prompt through the LLM."""
         response = self.llm.invoke(prompt)
         content = getattr(response, "content", None) or getattr(response, "text", None) or str(response)
         return content.strip()
 
+    def _model_id(self) -> str:
+        """Identity of the generating model; part of the manifest input hash."""
+        return "|".join(
+            str(getattr(self.llm, attr, ""))
+            for attr in ("deployment_name", "model_name", "temperature")
+        ) or type(self.llm).__name__
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        path = os.path.join(self.base_output_dir, MANIFEST_FILE)
+        if self.incremental and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"Ignoring unreadable manifest: {e}")
+        return {"components": {}}
+
+    def _save_manifest(self, manifest: Dict[str, Any]):
+        if not (self.incremental and self.auto_save):
+            return
+        self._atomic_write(MANIFEST_FILE, json.dumps(manifest, indent=2))
+
+    def _atomic_write(self, filename: str, text: str):
+        """Write a file so readers only ever see the old or the complete new version."""
+        fd, tmp = tempfile.mkstemp(dir=self.base_output_dir, prefix=f".{filename}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, os.path.join(self.base_output_dir, filename))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    @staticmethod
+    def _check_stop(stop: Optional[threading.Event]):
+        if stop is not None and stop.is_set():
+            raise GenerationStopped("Code generation was stopped.")
+
+    def _iter_tokens(self, prompt: str) -> Iterator[str]:
+        """Text pieces of the completion; LLMs without .stream() yield a single piece."""
+        if not hasattr(self.llm, "stream"):
+            yield self._complete(prompt)
+            return
+        for chunk in self.llm.stream(prompt):
+            piece = getattr(chunk, "content", chunk)
+            yield piece if isinstance(piece, str) else str(piece)
+
+    def _stream_component(
+        self,
+        component_name: str,
+        prompt: str,
+        filename: str,
+        emit: Callable[[Dict[str, Any]], None],
+        stop: Optional[threading.Event] = None
+    ) -> Tuple[Optional[str], int, str]:
+        """
+        Stream one component's code into a temp file next to its target, then rename it
+        into place. Leading/trailing whitespace is stripped as in non-streaming mode.
+        Setting `stop` abandons the stream (and the file) at the next token.
+        Returns (content, size, sha256); content is None when it was only written to disk.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        kept = [] if not self.auto_save else None
+        out = tmp = None
+        if self.auto_save:
+            fd, tmp = tempfile.mkstemp(dir=self.base_output_dir, prefix=f".{filename}.", suffix=".tmp")
+            out = os.fdopen(fd, "w", encoding="utf-8")
+
+        def write(text: str):
+            nonlocal size
+            if out is not None:
+                out.write(text)
+                out.flush()
+            else:
+                kept.append(text)
+            digest.update(text.encode("utf-8"))
+            size += len(text)
+            emit({"event": "chunk", "component": component_name, "text": text})
+
+        try:
+            started, pending = False, ""
+            for piece in self._iter_tokens(prompt):
+                self._check_stop(stop)
+                if not started:
+                    piece = piece.lstrip()
+                    if not piece:
+                        continue
+                    started = True
+                body = piece.rstrip()
+                # Hold back trailing whitespace until more code follows it.
+                if body:
+                    write(pending + body)
+                    pending = piece[len(body):]
+                else:
+                    pending += piece
+
+            if out is not None:
+                out.close()
+                os.replace(tmp, os.path.join(self.base_output_dir, filename))
+        except BaseException:
+            if out is not None:
+                out.close()
+                os.remove(tmp)
+            raise
+
+        return ("".join(kept) if kept is not None else None), size, digest.hexdigest()
+
+    def _generate_to_file(
+        self,
+        component_name: str,
+        prompt: str,
+        filename: str,
+        stream: bool,
+        emit: Callable[[Dict[str, Any]], None],
+        stop: Optional[threading.Event] = None
+    ) -> Tuple[Optional[str], int, str]:
+        """
+        Worker body: generate one component and save it; same return shape as _stream_component.
+        A failed attempt leaves the previous file untouched; retries start the component over.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            self._check_stop(stop)
+            emit({"event": "component_start", "component": component_name})
+            try:
+                if stream:
+                    return self._stream_component(component_name, prompt, filename, emit, stop)
+
+                code = self._complete(prompt)
+                if self.auto_save:
+                    self._atomic_write(filename, code)
+                return code, len(code), _sha256(code)
+            except GenerationStopped:
+                raise
+            except Exception as e:
+                kind = self.retry_policy.classify(e)
+                if not self.retry_policy.should_retry(kind, attempt):
+                    raise
+                delay = self.retry_policy.delay(kind, attempt, e)
+                print(f"Retrying {component_name} in {delay:.1f}s after {kind} error: {e}")
+                if stop is not None:
+                    stop.wait(delay)
+                else:
+                    time.sleep(delay)
+
+    def _reusable_code(self, manifest: Dict[str, Any], component_name: str, input_hash: str) -> Optional[str]:
+        """Previous output for the component if its inputs are unchanged and the file is untouched."""
+        entry = manifest["components"].get(component_name)
+        if not (self.incremental and self.auto_save and entry and entry.get("input_hash") == input_hash):
+            return None
+
+        path = os.path.join(self.base_output_dir, entry["file"])
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            code = f.read()
+        # A hand-edited file no longer matches the recorded output, so it is regenerated.
+        return code if _sha256(code) == entry.get("output_hash") else None
+
     def _generate_main_script(self, plan: Dict[str, Any]) -> str:
         """
         Create the main orchestrator script depending on the selected framework.
@@ -97,23 +337,39 @@ Return valid {language} source code only.
             return "# No components defined in plan.\n"
 
         if framework == "langgraph":
+            graph = component_dependencies(plan["components"])
+            order = [name for wave in topological_waves(plan["components"]) for name in wave]
+
             lines = [
                 "# Auto-generated LangGraph Orchestrator",
-                "from langgraph.graph import StateGraph, END",
+                "from langgraph.graph import StateGraph, START, END",
                 "from typing import Dict, Any",
                 "",
                 "graph = StateGraph()"
             ]
-            for comp in components:
+            for comp in order:
                 safe_name = comp.lower()
                 lines.append(f"from {safe_name} import {comp}")
                 lines.append(f'graph.add_node("{comp}", {comp})')
 
-            for i in range(len(components) - 1):
-                lines.append(f'graph.add_edge("{components[i]}", "{components[i+1]}")')
+            if not any(graph.values()):
+                # No declared dependencies between components: run them as a chain in plan order.
+                for i in range(len(components) - 1):
+                    lines.append(f'graph.add_edge("{components[i]}", "{components[i+1]}")')
+                lines.append(f'graph.set_entry_point("{components[0]}")')
+                lines.append(f'graph.add_edge("{components[-1]}", END)')
+            else:
+                # Edges follow the dependency DAG: roots start from START, leaves end at END.
+                has_dependents = {dep for deps in graph.values() for dep in deps}
+                for comp in order:
+                    if not graph[comp]:
+                        lines.append(f'graph.add_edge(START, "{comp}")')
+                    for dep in graph[comp]:
+                        lines.append(f'graph.add_edge("{dep}", "{comp}")')
+                for comp in order:
+                    if comp not in has_dependents:
+                        lines.append(f'graph.add_edge("{comp}", END)')
 
-            lines.append(f'graph.set_entry_point("{components[0]}")')
-            lines.append(f'graph.add_edge("{components[-1]}", END)')
             lines.append("")
             lines.append("if __name__ == '__main__':")
             lines.append("    result = graph.run({'input': 'start'})")
@@ -123,40 +379,204 @@ Return valid {language} source code only.
         # Fallback orchestrator for other frameworks
         return f"# Orchestrator for {framework}\n# TODO: Implement orchestration logic here.\n"
 
-    def write_system_code(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+    def iter_system_code(
+        self,
+        plan: Dict[str, Any],
+        stream: Optional[bool] = None,
+        stop: Optional[threading.Event] = None
+    ) -> Iterator[Dict[str, Any]]:
         """
-        Generate code for all components and optionally save to disk.
-        Returns a dictionary with file contents and status.
+        Generate code for all components, yielding progress events as work happens:
+            {"event": "start", "components": [...]}
+            {"event": "component_start", "component": name}
+            {"event": "chunk", "component": name, "text": ...}        (streaming only)
+            {"event": "component_done", "component": name, "file": ..., "size": ..., "reused": bool}
+            {"event": "done", "result": {...}}                        (same as write_system_code)
+        Setting `stop` (from any thread) ends the run with GenerationStopped: queued components
+        are not started and streamed components stop at their next token.
         """
         if "components" not in plan:
             raise ValueError("Plan missing 'components' key.")
+        stream = self.stream if stream is None else stream
 
-        generated_files = {}
-        print("Starting system code generation.")
+        components = plan["components"]
+        # Resolve the schedule first so a dependency cycle fails before any LLM call.
+        waves = topological_waves(components)
+        graph = component_dependencies(components)
 
-        # Iterate through each component and generate code
-        for comp_name, details in plan["components"].items():
-            print(f"Generating component: {comp_name}")
-            code = self._generate_component_code(comp_name, details, plan)
-            filename = f"{comp_name.lower()}.py"
-            filepath = os.path.join(self.base_output_dir, filename)
+        files = {}
+        signatures = {}
+        manifest = self._load_manifest()
+        model_id = self._model_id()
+        reused = []
+        events: "queue.Queue[Dict[str, Any]]" = queue.Queue()
 
-            generated_files[filename] = code
+        def drain() -> Iterator[Dict[str, Any]]:
+            while True:
+                try:
+                    yield events.get_nowait()
+                except queue.Empty:
+                    return
 
-            if self.auto_save:
-                with open(filepath, "w", encoding="utf-8") as f:
-                    f.write(code)
+        def finish(comp_name: str, content: Optional[str], size: int, output_hash: str, was_reused: bool):
+            filename = f"{comp_name.lower()}.py"
+            files[comp_name] = {"name": filename, "content": content, "size": size}
+            if content is not None:
+                signatures[comp_name] = extract_signatures(content)
+            else:
+                with open(os.path.join(self.base_output_dir, filename), "r", encoding="utf-8") as f:
+                    signatures[comp_name] = extract_signatures(f.read())
+
+            if self.auto_save and not was_reused:
                 print(f"Saved {filename}")
+                # Recorded per component, so an interrupted run keeps what it finished.
+                manifest["components"][comp_name] = {
+                    "file": filename,
+                    "input_hash": input_hashes[comp_name],
+                    "output_hash": output_hash
+                }
+                self._save_manifest(manifest)
+            return {"event": "component_done", "component": comp_name, "file": filename,
+                    "size": size, "reused": was_reused}
+
+        print("Starting system code generation.")
+        yield {"event": "start", "components": list(components)}
+
+        # Each wave only depends on earlier waves, so its components are generated
+        # concurrently with the signatures of their finished dependencies.
+        input_hashes = {}
+        workers = min(self.max_concurrency, max(len(w) for w in waves) if waves else 1) or 1
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for wave in waves:
+                futures = {}
+                for comp_name in wave:
+                    self._check_stop(stop)
+                    dep_signatures = {dep: signatures[dep] for dep in graph[comp_name]}
+                    prompt = self._build_code_prompt(comp_name, components[comp_name], plan, dep_signatures)
+                    input_hashes[comp_name] = _sha256(model_id + "\n" + prompt)
+
+                    code = self._reusable_code(manifest, comp_name, input_hashes[comp_name])
+                    if code is not None:
+                        print(f"Unchanged component, reusing: {comp_name}")
+                        reused.append(comp_name)
+                        content = None if (stream and self.auto_save) else code
+                        yield finish(comp_name, content, len(code), _sha256(code), True)
+                        continue
+
+                    print(f"Generating component: {comp_name}")
+                    future = pool.submit(
+                        self._generate_to_file, comp_name, prompt, f"{comp_name.lower()}.py", stream, events.put, stop
+                    )
+                    futures[future] = comp_name
+
+                pending = set(futures)
+                while pending:
+                    done, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+                    if stop is not None and stop.is_set():
+                        for future in pending:
+                            future.cancel()
+                        self._check_stop(stop)
+                    yield from drain()
+                    for future in done:
+                        content, size, output_hash = future.result()
+                        yield finish(futures[future], content, size, output_hash, False)
+                yield from drain()
 
         # Generate orchestrator script
         print("Generating main orchestrator script.")
         main_code = self._generate_main_script(plan)
-        generated_files["main.py"] = main_code
 
         if self.auto_save:
-            with open(os.path.join(self.base_output_dir, "main.py"), "w", encoding="utf-8") as f:
-                f.write(main_code)
-            print("Saved main.py")
+            main_path = os.path.join(self.base_output_dir, "main.py")
+            previous = None
+            if os.path.exists(main_path):
+                with open(main_path, "r", encoding="utf-8") as f:
+                    previous = f.read()
+            if previous != main_code:
+                self._atomic_write("main.py", main_code)
+                print("Saved main.py")
+
+        # Return files in plan order, independent of the schedule.
+        ordered = [files[name] for name in components]
+        ordered.append({"name": "main.py", "content": main_code, "size": len(main_code)})
+
+        print(f"Code generation complete ({len(components) - len(reused)} generated, {len(reused)} reused).")
+        yield {
+            "event": "done",
+            "result": {
+                "status": "success",
+                "files": ordered,
+                "regenerated": [name for name in components if name not in reused],
+                "reused": reused
+            }
+        }
+
+    def write_system_code(
+        self,
+        plan: Dict[str, Any],
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+        stream: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate code for all components and optionally save to disk.
+        Returns a dictionary with file contents and status. Progress events from
+        iter_system_code are passed to on_event when given.
+        """
+        result = None
+        for event in self.iter_system_code(plan, stream=stream):
+            if on_event is not None:
+                on_event(event)
+            if event["event"] == "done":
+                result = event["result"]
+        return result
+
+    async def aiter_system_code(
+        self, plan: Dict[str, Any], stream: Optional[bool] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        iter_system_code for async callers. Generation and file I/O run on a thread of
+        the writer's own pool; events are handed back to the event loop as they happen.
+        Cancelling the consumer (or closing the iterator) stops the run, so no further
+        LLM calls are started and streamed completions are abandoned.
+        """
+        loop = asyncio.get_running_loop()
+        events: "asyncio.Queue[Any]" = asyncio.Queue()
+        finished = object()
+        stop = threading.Event()
+
+        def pump():
+            try:
+                for event in self.iter_system_code(plan, stream=stream, stop=stop):
+                    loop.call_soon_threadsafe(events.put_nowait, event)
+            except BaseException as e:
+                loop.call_soon_threadsafe(events.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(events.put_nowait, finished)
+
+        worker = loop.run_in_executor(self._async_pool, pump)
+        try:
+            while True:
+                item = await events.get()
+                if item is finished:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            await worker
 
-        print("Code generation complete.")
-        return {"status": "success", "files": [{"name": k, "content": v} for k, v in generated_files.items()]}
+    async def awrite_system_code(
+        self,
+        plan: Dict[str, Any],
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+        stream: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """write_system_code without blocking the event loop; on_event is called on the loop's thread."""
+        result = None
+        async for event in self.aiter_system_code(plan, stream=stream):
+            if on_event is not None:
+                on_event(event)
+            if event["event"] == "done":
+                result = event["result"]
+        return result